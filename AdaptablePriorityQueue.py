@@ -64,7 +64,7 @@ class AdaptablePriorityQueue:
         parent_pos = (el_pos-1) // 2
         if parent_pos < 0:
             parent_pos = 0
-        parent = self.APQ[(el_pos-1) // 2]
+        parent = self.APQ[parent_pos]
         if parent > el:
             self.bubble_up(el)
         else:
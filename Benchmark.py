@@ -0,0 +1,185 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from MapGenerator import *
+from MapLoader import *
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentiles(samples, points=PERCENTILES):
+    """ Return a summary dict of samples: nearest-rank percentiles, mean, min and max. """
+    ordered = sorted(samples)
+    if not ordered:
+        return dict()
+    n = len(ordered)
+    summary = {'p' + str(p): ordered[max(0, -(-p * n // 100) - 1)] for p in points}
+    summary['mean'] = sum(ordered) / n
+    summary['min'] = ordered[0]
+    summary['max'] = ordered[-1]
+    return summary
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def _peak(function, *args):
+    """ Return the peak traced memory, in bytes, of one call of function. """
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _revision():
+    """ Return the git commit of this tree, or None outside a git checkout. """
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                             cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def benchmark_map(filename, queries=100, searches=10, central_samples=16,
+                  seed=0, memory=True):
+    """ Time the main operations on the map in filename and return a report dict.
+
+    Loading, point-to-point dijkstra, sp, breadth-first search and
+    central_vertex are timed, each query on its own, and summarised by
+    percentiles in seconds. Dijkstra also reports how many vertices it
+    settled. With memory set, each operation is run once more under
+    tracemalloc for its peak memory; timings are never taken while tracing.
+
+    Args:
+        filename - a Node/Edge map file
+        queries - the number of random source/target pairs
+        searches - the number of random breadth-first search sources
+        central_samples - the samples for an approximate central_vertex;
+            None computes it exactly, 0 skips it
+        seed - the random seed for choosing queries
+        memory - if True, report peak memory as well
+    """
+    report = {'map': os.path.basename(filename)}
+    load_time, (graph, nodes, edges) = _timed(load_routemap, filename)
+    report['vertices'] = nodes
+    report['edges'] = edges
+    report['load'] = {'seconds': load_time}
+
+    rnd = random.Random(seed)
+    vertices = list(graph.vertices())
+    pairs = [(rnd.choice(vertices), rnd.choice(vertices)) for _ in range(queries)]
+
+    times, settled, reached = [], [], []
+    for s, t in pairs:
+        secs, closed = _timed(graph.dijkstra, s, t)
+        times.append(secs)
+        settled.append(len(closed))
+        if t in closed:
+            reached.append((s, t))
+    report['dijkstra'] = {'seconds': percentiles(times),
+                          'settled': percentiles(settled),
+                          'unreachable': len(pairs) - len(reached)}
+
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        for s, t in reached:
+            times.append(_timed(graph.sp, s, t)[0])
+            out.seek(0)
+            out.truncate()
+    report['sp'] = {'seconds': percentiles(times)}
+
+    sources = [rnd.choice(vertices) for _ in range(searches)]
+    times = [_timed(graph.breadthfirstsearch, s)[0] for s in sources]
+    report['bfs'] = {'seconds': percentiles(times)}
+
+    if central_samples != 0:
+        secs, (steps, central) = _timed(graph.central_vertex, 1, central_samples)
+        report['central_vertex'] = {'seconds': secs, 'steps': steps,
+                                    'candidates': len(central or ()),
+                                    'samples': central_samples}
+
+    if memory:
+        report['load']['peak_bytes'] = _peak(load_routemap, filename)
+        if pairs:
+            report['dijkstra']['peak_bytes'] = _peak(graph.dijkstra, *pairs[0])
+        if reached:
+            with contextlib.redirect_stdout(io.StringIO()):
+                report['sp']['peak_bytes'] = _peak(graph.sp, *reached[0])
+        if sources:
+            report['bfs']['peak_bytes'] = _peak(graph.breadthfirstsearch, sources[0])
+        if central_samples != 0:
+            report['central_vertex']['peak_bytes'] = _peak(graph.central_vertex,
+                                                           1, central_samples)
+    return report
+
+
+def run(maps, queries=100, searches=10, central_samples=16, seed=0, memory=True):
+    """ Benchmark each map and return the results with details of the run.
+
+    Args:
+        maps - map files, or generator specs 'kind:size' such as
+            'grid:100', 'geometric:10000' or 'city:40' (see MapGenerator)
+        the rest - as for benchmark_map
+    """
+    results = {'revision': _revision(),
+               'python': platform.python_version(),
+               'machine': platform.machine(),
+               'queries': queries,
+               'seed': seed,
+               'maps': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for spec in maps:
+            filename = spec
+            kind, _, size = spec.partition(':')
+            if kind in GENERATORS and size.isdigit() and not os.path.exists(spec):
+                filename = os.path.join(tmp, kind + '_' + size + '.txt')
+                generate(kind, int(size), filename, seed)
+            report = benchmark_map(filename, queries, searches, central_samples,
+                                   seed, memory)
+            report['map'] = spec
+            results['maps'].append(report)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark routing on road maps.')
+    parser.add_argument('maps', nargs='*',
+                        help="map files or 'kind:size' specs; defaults to "
+                             "corkCityData.txt if present, else generated maps")
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--searches', type=int, default=10)
+    parser.add_argument('--central-samples', type=int, default=16,
+                        help='0 skips central_vertex, -1 computes it exactly')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true')
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+    maps = args.maps
+    if not maps:
+        maps = ['corkCityData.txt'] if os.path.exists('corkCityData.txt') \
+            else ['grid:100', 'geometric:10000', 'city:40']
+    samples = None if args.central_samples < 0 else args.central_samples
+    results = run(maps, args.queries, args.searches, samples, args.seed,
+                  not args.no_memory)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
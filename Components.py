@@ -0,0 +1,159 @@
+class ComponentIndex:
+    """ The connected components of a graph, for O(1) reachability checks.
+
+        The searches in Graph and RouteMap travel every edge both ways, so
+        two vertices have a route between them exactly when they are in the
+        same connected component. These are found with a union-find over
+        the edges, flattened after the build so every lookup is a single
+        dict access. Vertices and edges added later are merged in, as
+        Graph.add_vertex and Graph.add_edge do for the graph's own index.
+
+        Honouring one-way roads, routes must also stay in one strongly
+        connected component to be possible in both directions. Those are
+        found by strongly_connected_components the first time they are
+        asked for, and again after the graph changes.
+    """
+
+    def __init__(self, graph):
+        """ Build the index of graph's components.
+
+        Args:
+            graph - a Graph or RouteMap object
+        """
+        self._graph = graph
+        self._parent = dict()  # vertex -> parent vertex, a root is its own parent
+        self._size = dict()  # root -> number of vertices in its component
+        self._strong = None  # vertex -> strong component number, built on demand
+        for v in graph.vertices():
+            self._parent[v] = v
+            self._size[v] = 1
+        for e in graph.edges():
+            self.add_edge(*e.vertices())
+        parent = self._parent
+        for v in parent:
+            parent[v] = self.find(v)
+
+    def __len__(self):
+        """ Return the number of components. """
+        return len(self._size)
+
+    def find(self, v):
+        """ Return the vertex that represents v's component, or None if v is unknown. """
+        parent = self._parent
+        if v not in parent:
+            return None
+        root = v
+        while parent[root] is not root:
+            root = parent[root]
+        while parent[v] is not root:
+            parent[v], v = root, parent[v]
+        return root
+
+    def add_vertex(self, v):
+        """ Add v as a component of its own. """
+        self._parent[v] = v
+        self._size[v] = 1
+        self._strong = None
+
+    def add_edge(self, v, w):
+        """ Merge the components of v and w. """
+        self._strong = None
+        a, b = self.find(v), self.find(w)
+        if a is b:
+            return
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size.pop(b)
+
+    def reachable(self, v, w):
+        """ Return True if there is a route between v and w. """
+        a = self.find(v)
+        return a is not None and a is self.find(w)
+
+    def component_size(self, v):
+        """ Return the number of vertices in v's component, or 0 if v is unknown. """
+        root = self.find(v)
+        return 0 if root is None else self._size[root]
+
+    def largest(self):
+        """ Return the set of vertices in the largest component. """
+        if not self._size:
+            return set()
+        root = max(self._size, key=self._size.get)
+        return {v for v in self._parent if self.find(v) is root}
+
+    def strong_components(self):
+        """ Return the dict of vertex -> strong component number, honouring one-way roads. """
+        if self._strong is None:
+            self._strong = strongly_connected_components(
+                self._graph, getattr(self._graph, 'oneway', ()))
+        return self._strong
+
+    def strongly_connected(self, v, w):
+        """ Return True if v and w can reach each other along one-way roads. """
+        strong = self.strong_components()
+        return v in strong and w in strong and strong[v] == strong[w]
+
+    def largest_strong(self):
+        """ Return the set of vertices in the largest strong component. """
+        strong = self.strong_components()
+        sizes = dict()
+        for c in strong.values():
+            sizes[c] = sizes.get(c, 0) + 1
+        if not sizes:
+            return set()
+        best = max(sizes, key=sizes.get)
+        return {v for v, c in strong.items() if c == best}
+
+
+def strongly_connected_components(graph, oneway=()):
+    """ Return a dict of vertex -> strongly connected component number.
+
+    Tarjan's algorithm, run with an explicit stack so large maps do not hit
+    the recursion limit. Edges in oneway are only followed from start() to
+    end(); all others are followed both ways. Components are numbered in
+    the order they are completed.
+
+    Args:
+        graph - a Graph or RouteMap object
+        oneway - a set of the edges that are one-way
+    """
+    index = dict()  # vertex -> order of discovery
+    low = dict()  # vertex -> lowest index reachable from its subtree
+    component = dict()
+    stack = []  # discovered vertices not yet assigned a component
+    count = 0
+    for root in graph.vertices():
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        work = [(root, iter(graph.get_edges(root)))]
+        while work:
+            v, edges = work[-1]
+            for e in edges:
+                if e in oneway and e.start() is not v:
+                    continue
+                w = e.opposite(v)
+                if w not in index:
+                    index[w] = low[w] = len(index)
+                    stack.append(w)
+                    work.append((w, iter(graph.get_edges(w))))
+                    break
+                if w not in component and index[w] < low[v]:
+                    low[v] = index[w]
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        component[w] = count
+                        if w is v:
+                            break
+                    count += 1
+    return component
@@ -0,0 +1,303 @@
+from array import array
+from heapq import heappush, heappop
+import pickle
+
+
+class ContractionHierarchy:
+    """ A contraction hierarchy over a Graph or RouteMap, for fast queries.
+
+        Preprocessing contracts the vertices one at a time, from least to most
+        important, adding a shortcut edge between two neighbours of the
+        contracted vertex whenever the only shortest path between them ran
+        through it. Each vertex then keeps only its 'upward' edges, to
+        vertices contracted after it, in compressed-sparse-row arrays. A
+        query is a bidirectional Dijkstra that only follows upward edges, and
+        shortcuts on the resulting path are unpacked back into the original
+        edges.
+
+        The hierarchy is a snapshot: it does not see later changes to the
+        graph. Edges whose element is None are given a weight of 1.
+    """
+
+    VERSION = 1
+
+    def __init__(self, graph):
+        """ Create an empty hierarchy for graph; call build() or load() next.
+
+        Args:
+            graph - a Graph or RouteMap object
+        """
+        self._graph = graph
+        self._vertices = graph.vertices()
+        self._index = {v: i for i, v in enumerate(self._vertices)}
+        self._rank = None
+        self._offsets = None   # upward edges of vertex i are at
+        self._targets = None   # offsets[i]:offsets[i+1] in targets,
+        self._weights = None   # weights and middle; middle is -1 for an
+        self._middle = None    # original edge, else the bypassed vertex
+
+    # -----------------------------------------------------------------------#
+
+    # Preprocessing
+
+    def build(self, witness_limit=500):
+        """ Order and contract every vertex, adding shortcuts as needed.
+
+        Args:
+            witness_limit - the most vertices a witness search may settle
+                before giving up and adding the shortcut anyway
+        """
+        n = len(self._vertices)
+        adj = [dict() for _ in range(n)]  # uncontracted neighbour -> weight
+        middle = dict()  # (i, j) with i < j -> bypassed vertex or -1
+        for i, v in enumerate(self._vertices):
+            for e in self._graph.get_edges(v):
+                j = self._index[e.opposite(v)]
+                if j == i:
+                    continue
+                weight = 1 if e.element() is None else e.element()
+                if j not in adj[i] or weight < adj[i][j]:
+                    adj[i][j] = weight
+                    middle[(min(i, j), max(i, j))] = -1
+
+        deleted = [0] * n  # number of contracted neighbours, per vertex
+        heap = [(self._priority(v, adj, deleted, witness_limit // 10), v)
+                for v in range(n)]
+        heap.sort()
+        rank = array('i', [0] * n)
+        up = [None] * n
+        order = 0
+        while heap:
+            _, v = heappop(heap)
+            # lazy update: re-evaluate v and put it back if it is no longer
+            # the least important vertex
+            priority = self._priority(v, adj, deleted, witness_limit // 10)
+            if heap and priority > heap[0][0]:
+                heappush(heap, (priority, v))
+                continue
+            for u, x, cost in self._shortcuts(v, adj, witness_limit):
+                if x not in adj[u] or cost < adj[u][x]:
+                    adj[u][x] = cost
+                    adj[x][u] = cost
+                    middle[(min(u, x), max(u, x))] = v
+            rank[v] = order
+            order += 1
+            up[v] = adj[v]
+            for u in adj[v]:
+                del adj[u][v]
+                deleted[u] += 1
+            adj[v] = dict()
+
+        offsets = array('q', [0])
+        targets = array('i')
+        weights = array('d')
+        middles = array('i')
+        for v in range(n):
+            for u, weight in up[v].items():
+                targets.append(u)
+                weights.append(weight)
+                middles.append(middle[(min(u, v), max(u, v))])
+            offsets.append(len(targets))
+        self._rank = rank
+        self._offsets, self._targets = offsets, targets
+        self._weights, self._middle = weights, middles
+        return self
+
+    def _witnesses(self, u, skip, limit, adj, settle_limit):
+        """ Return costs from u found by a bounded search that avoids skip. """
+        dist = {u: 0}
+        heap = [(0, u)]
+        settled = 0
+        while heap and settled < settle_limit:
+            d, x = heappop(heap)
+            if d > dist[x]:
+                continue
+            if d > limit:
+                break
+            settled += 1
+            for y, weight in adj[x].items():
+                if y != skip:
+                    cost = d + weight
+                    if y not in dist or cost < dist[y]:
+                        dist[y] = cost
+                        heappush(heap, (cost, y))
+        return dist
+
+    def _shortcuts(self, v, adj, settle_limit):
+        """ Return the (u, x, cost) shortcuts needed to contract v. """
+        shortcuts = []
+        nbrs = list(adj[v].items())
+        for i, (u, w_uv) in enumerate(nbrs):
+            rest = nbrs[i + 1:]
+            if not rest:
+                break
+            limit = w_uv + max(w for _, w in rest)
+            dist = self._witnesses(u, v, limit, adj, settle_limit)
+            for x, w_vx in rest:
+                cost = w_uv + w_vx
+                if dist.get(x, float('inf')) > cost:
+                    shortcuts.append((u, x, cost))
+        return shortcuts
+
+    def _priority(self, v, adj, deleted, settle_limit):
+        """ Return the contraction priority of v; lower is contracted first. """
+        added = len(self._shortcuts(v, adj, settle_limit))
+        return added - len(adj[v]) + deleted[v]
+
+    # -----------------------------------------------------------------------#
+
+    # Queries
+
+    def distance(self, v, w):
+        """ Return the cost of the shortest path from v to w, or None. """
+        result = self._search(self._index[v], self._index[w])
+        return None if result is None else result[0]
+
+    def query(self, v, w):
+        """ Return a dict of vertex -> (cost, preceding vertex) for the path v to w.
+
+        The dict has the same shape as the result of
+        Graph.bidirectional_dijkstra: only the vertices on the shortest path,
+        with costs from v, so it can be passed to RouteMap.sp and
+        RouteMap.print_paths_for_GPS. It is empty if w is unreachable.
+        """
+        s, t = self._index[v], self._index[w]
+        result = self._search(s, t)
+        path = dict()
+        if result is None:
+            return path
+        _, meet, forward, backward = result
+        chain = [meet]
+        while forward[chain[-1]][1] is not None:
+            chain.append(forward[chain[-1]][1])
+        chain.reverse()
+        while backward[chain[-1]][1] is not None:
+            chain.append(backward[chain[-1]][1])
+
+        vertices = self._vertices
+        path[vertices[s]] = (0, None)
+        cost = 0
+        for i in range(1, len(chain)):
+            for a, b, weight in self._unpack(chain[i - 1], chain[i]):
+                cost += weight
+                path[vertices[b]] = (cost, vertices[a])
+        return path
+
+    def _search(self, s, t):
+        """ Return (cost, meeting vertex, forward, backward) or None.
+
+        forward and backward map each vertex settled by the upward search
+        from s and t to its (cost, preceding vertex).
+        """
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        heaps = [[(0, s)], [(0, t)]]
+        dists = [{s: 0}, {t: 0}]
+        closed = [dict(), dict()]
+        preds = [{s: None}, {t: None}]
+        best = None
+        meet = None
+        while heaps[0] or heaps[1]:
+            for side in (0, 1):
+                heap = heaps[side]
+                if not heap:
+                    continue
+                d, v = heappop(heap)
+                if v in closed[side]:
+                    continue
+                if best is not None and d >= best:
+                    heap.clear()  # nothing left on this side can improve best
+                    continue
+                dist = dists[side]
+                stalled = False  # stall-on-demand: v is reached more cheaply
+                for i in range(offsets[v], offsets[v + 1]):  # from above
+                    w = targets[i]
+                    if w in dist and dist[w] + weights[i] < d:
+                        stalled = True
+                        break
+                if stalled:
+                    continue
+                closed[side][v] = (d, preds[side][v])
+                other = closed[1 - side]
+                if v in other and (best is None or d + other[v][0] < best):
+                    best = d + other[v][0]
+                    meet = v
+                for i in range(offsets[v], offsets[v + 1]):
+                    w = targets[i]
+                    cost = d + weights[i]
+                    if w not in dist or cost < dist[w]:
+                        dist[w] = cost
+                        preds[side][w] = v
+                        heappush(heap, (cost, w))
+        if meet is None:
+            return None
+        return best, meet, closed[0], closed[1]
+
+    def _edge(self, a, b):
+        """ Return (weight, middle) of the hierarchy edge between a and b. """
+        low, high = (a, b) if self._rank[a] < self._rank[b] else (b, a)
+        for i in range(self._offsets[low], self._offsets[low + 1]):
+            if self._targets[i] == high:
+                return self._weights[i], self._middle[i]
+        return None
+
+    def _unpack(self, a, b):
+        """ Return the original edges as (from, to, weight) for edge a to b. """
+        edges = []
+        stack = [(a, b)]
+        while stack:
+            x, y = stack.pop()
+            weight, mid = self._edge(x, y)
+            if mid < 0:
+                edges.append((x, y, weight))
+            else:
+                stack.append((mid, y))
+                stack.append((x, mid))
+        return edges
+
+    # -----------------------------------------------------------------------#
+
+    # Persistence
+
+    def save(self, filename):
+        """ Write the hierarchy to filename, keyed by vertex label. """
+        data = {'version': self.VERSION,
+                'labels': [v.element() for v in self._vertices],
+                'rank': self._rank,
+                'offsets': self._offsets,
+                'targets': self._targets,
+                'weights': self._weights,
+                'middle': self._middle}
+        with open(filename, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename, graph):
+        """ Return the hierarchy saved in filename, attached to graph.
+
+        Vertices are matched to graph by label, so graph should be the same
+        map the hierarchy was built from.
+
+        Args:
+            filename - a file written by save()
+            graph - a Graph or RouteMap object
+        """
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') != cls.VERSION:
+            raise ValueError('Unsupported contraction hierarchy version: '
+                             + str(data.get('version')))
+        ch = cls.__new__(cls)
+        by_label = dict()
+        for v in graph.vertices():
+            by_label.setdefault(v.element(), v)
+        ch._graph = graph
+        ch._vertices = [by_label[label] for label in data['labels']]
+        ch._index = {v: i for i, v in enumerate(ch._vertices)}
+        ch._rank = data['rank']
+        ch._offsets, ch._targets = data['offsets'], data['targets']
+        ch._weights, ch._middle = data['weights'], data['middle']
+        return ch
+
+    def num_shortcuts(self):
+        """ Return the number of shortcut edges added by build(). """
+        return sum(1 for m in self._middle if m >= 0)
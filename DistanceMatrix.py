@@ -0,0 +1,62 @@
+import os
+
+from GraphPool import *
+
+
+def _rows(sources, targets=None):
+    """ Return the distance rows for a batch of source ids.
+
+    Targets default to the ones installed in the worker by graph_pool.
+    """
+    graph = worker_graph()
+    if targets is None:
+        targets = worker_data()
+    return [graph.one_to_many(s, targets) for s in sources]
+
+
+def distance_matrix(frozen, sources, targets, processes=None, pool=None):
+    """ Return a list with one array of path costs per source, over targets.
+
+    Row i, column j holds the cost from sources[i] to targets[j], or
+    infinity if there is no path. Each row is a one-to-many search that
+    stops once every target is settled.
+
+    With more than one process, the sources are split into batches and
+    spread over a process pool. The graph and targets are handed to each
+    worker once when it starts, and on platforms that fork they are
+    inherited rather than pickled, so workers share the parent's copy.
+
+    Starting the pool costs more than a small matrix, so callers asking for
+    many can start one with graph_pool(frozen, processes) and pass it in.
+    It is kept open, and the targets are sent along with each batch.
+
+    Args:
+        frozen - a FrozenGraph object
+        sources - a list of source vertex ids
+        targets - a list of target vertex ids
+        processes - the number of worker processes; defaults to the number
+            of CPUs, and 1 runs in this process; with pool, the number of
+            workers in it
+        pool - optional multiprocessing.Pool from graph_pool(frozen, ...)
+    """
+    sources = list(sources)
+    targets = list(targets)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if pool is None:
+        processes = min(processes, len(sources))
+        if processes <= 1:
+            return [frozen.one_to_many(s, targets) for s in sources]
+
+    # a few batches per worker keeps them busy without per-row overhead
+    size = max(-(-len(sources) // (processes * 4)), 1)
+    batches = [sources[i:i + size] for i in range(0, len(sources), size)]
+    if pool is not None:
+        done = pool.starmap(_rows, [(batch, targets) for batch in batches])
+    else:
+        with graph_pool(frozen, processes, targets) as pool:
+            done = pool.map(_rows, batches)
+    rows = []
+    for batch in done:
+        rows.extend(batch)
+    return rows
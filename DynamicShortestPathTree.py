@@ -0,0 +1,162 @@
+from heapq import heappush, heappop
+
+INF = float('inf')
+
+
+class DynamicShortestPathTree:
+    """ A single-source shortest-path tree that is repaired as weights change.
+
+        The tree is held in the same dict shape that Graph.dijkstra returns,
+        vertex -> (cost, preceding vertex), and is updated in place. When
+        edge weights change it follows Ramalingam and Reps: vertices below
+        an edge that got more expensive are cut loose, re-seeded from their
+        unaffected neighbours, and a Dijkstra pass then settles only the
+        vertices whose cost actually changes. Cheaper edges seed that pass
+        directly. The work is proportional to the part of the tree that
+        changes, not to the size of the graph.
+
+        Trees created with register=True are repaired automatically by
+        Graph.update_edge_weight(s), Graph.add_edge and
+        Graph.remove_vertices.
+    """
+
+    def __init__(self, graph, source, closed=None, weight=None, register=True):
+        """ Create the tree of shortest paths from source.
+
+        Args:
+            graph - a Graph or RouteMap object
+            source - the source vertex
+            closed - an existing graph.dijkstra(source) result to adopt
+            weight - optional function giving the cost of an edge; defaults
+                to the edge element
+            register - if True, repair the tree whenever the graph's edge
+                weights change
+        """
+        self._graph = graph
+        self.source = source
+        self._weight = weight
+        if closed is None:
+            closed = graph.dijkstra(source, weight=weight)
+        self.closed = closed
+        self._children = None  # vertex -> set of children, built on demand
+        if register:
+            graph.track_tree(self)
+
+    def _cost(self, e):
+        return e.element() if self._weight is None else self._weight(e)
+
+    def _build_children(self):
+        children = dict()
+        for v, (cost, pred) in self.closed.items():
+            if pred is not None:
+                children.setdefault(pred, set()).add(v)
+        self._children = children
+
+    def _set(self, v, cost, pred):
+        """ Record v as reached at cost via pred, keeping children up to date. """
+        old = self.closed.get(v)
+        if old is not None and old[1] is not None:
+            self._children[old[1]].discard(v)
+        self.closed[v] = (cost, pred)
+        if pred is not None:
+            self._children.setdefault(pred, set()).add(v)
+
+    def repair(self, changes):
+        """ Bring the tree up to date after edge weight changes.
+
+        The new weights must already be in the graph. The old weights are
+        edge elements, so with a weight function of its own the tree cannot
+        tell which way a cost moved, and treats every changed edge as both
+        dearer and cheaper.
+
+        Args:
+            changes - a list of (edge, old element) pairs; use infinity as
+                the old element of a newly added edge
+        """
+        if self._children is None:
+            self._build_children()
+        closed = self.closed
+
+        # 1. cut loose every subtree hanging off an edge that got dearer
+        roots = []
+        for e, old in changes:
+            if self._weight is not None or self._cost(e) > old:
+                a, b = e.vertices()
+                for u, x in ((a, b), (b, a)):
+                    if x in closed and closed[x][1] == u:
+                        roots.append(x)
+        self._settle(self._cut(roots), changes)
+
+    def remove_vertices(self, vertices):
+        """ Bring the tree up to date after vertices were removed from the graph.
+
+        The subtrees below the removed vertices are re-attached through the
+        rest of the graph where they can be. If the source was removed the
+        tree becomes empty.
+
+        Args:
+            vertices - a list of the vertices removed
+        """
+        if self._children is None:
+            self._build_children()
+        affected = self._cut([x for x in vertices if x in self.closed])
+        affected.difference_update(vertices)
+        self._settle(affected, ())
+
+    def _cut(self, roots):
+        """ Remove the subtrees below roots from the tree, and return their vertices. """
+        closed, children = self.closed, self._children
+        affected = set()
+        stack = roots
+        while stack:
+            x = stack.pop()
+            if x in affected:
+                continue
+            affected.add(x)
+            stack.extend(children.get(x, ()))
+        for x in affected:
+            pred = closed.pop(x)[1]
+            if pred is not None and pred not in affected:
+                children[pred].discard(x)
+            children.pop(x, None)
+        return affected
+
+    def _settle(self, affected, changes):
+        """ Re-attach the affected vertices and apply cheaper edges in changes. """
+        closed = self.closed
+
+        # 2. seed a Dijkstra pass from the intact part of the tree
+        best = dict()  # vertex -> (tentative cost, pred)
+        heap = []
+
+        def offer(x, cost, pred):
+            current = best.get(x)
+            if current is None:
+                current = closed.get(x, (INF, None))
+            if cost < current[0]:
+                best[x] = (cost, pred)
+                heappush(heap, (cost, id(x), x))
+
+        for x in affected:
+            for e in self._graph.get_edges(x):
+                u = e.opposite(x)
+                if u in closed:
+                    offer(x, closed[u][0] + self._cost(e), u)
+        for e, old in changes:
+            new = self._cost(e)
+            if self._weight is not None or new < old:
+                a, b = e.vertices()
+                for u, x in ((a, b), (b, a)):
+                    if u in closed:
+                        offer(x, closed[u][0] + new, u)
+
+        # 3. settle whatever improves, relaxing outwards from it
+        while heap:
+            cost, _, x = heappop(heap)
+            if best.get(x, (None,))[0] != cost:
+                continue
+            pred = best.pop(x)[1]
+            self._set(x, cost, pred)
+            for e in self._graph.get_edges(x):
+                y = e.opposite(x)
+                offer(y, cost + self._cost(e), x)
@@ -6,6 +6,8 @@ class Edge:
         to handle them as directed or undirected.
     """
 
+    __slots__ = ('_vertices', '_element')  # no per-instance __dict__
+
     def __init__(self, v, w, element):
         """ Create an edge between vertices v and w, with a data element.
 
@@ -51,3 +53,11 @@ class Edge:
     def element(self):
         """ Return the data element for this edge. """
         return self._element
+
+    def set_element(self, element):
+        """ Replace the data element for this edge.
+
+        Args:
+            element - the new data or label for the edge
+        """
+        self._element = element
@@ -1,5 +1,7 @@
 class Element:
 
+    __slots__ = ('key', 'value', 'index')  # no per-instance __dict__
+
     def __init__(self, k, v, i):
         self.key = k
         self.value = v
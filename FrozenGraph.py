@@ -0,0 +1,370 @@
+from array import array
+from heapq import heappush, heappop
+import sys
+import time
+
+from RouteExport import *
+
+
+class FrozenGraph:
+    """ An immutable, array-backed copy of a Graph.
+
+        Vertices are the integers 0..n-1. The adjacency is stored in
+        compressed-sparse-row form: the neighbours of vertex v are
+        targets[offsets[v]:offsets[v+1]], with the matching edge weights in
+        the same slice of weights. Coordinates, if any, are held in two
+        parallel float arrays. Every undirected edge is stored once in each
+        direction, as it is in Graph._structure.
+    """
+
+    def __init__(self, labels, offsets, targets, weights, lats=None, longs=None,
+                 owner=None):
+        """ Create a frozen graph from prebuilt arrays.
+
+        The arrays may be any indexable sequences, including memoryviews of
+        a memory-mapped file.
+
+        Args:
+            labels - a sequence with the element of each vertex id
+            offsets - a sequence of n+1 positions into targets and weights
+            targets - a sequence of vertex ids
+            weights - a sequence of edge weights, parallel to targets
+            lats, longs - optional sequences of vertex coordinates
+            owner - an object the arrays live in, such as an mmap, which is
+                kept alive as long as the graph
+        """
+        self._labels = labels
+        self._offsets = offsets
+        self._targets = targets
+        self._weights = weights
+        self._lats = lats
+        self._longs = longs
+        self._ids = None  # label -> id, built on the first lookup
+        self._owner = owner
+
+    @classmethod
+    def from_graph(cls, graph, coords=None):
+        """ Build a frozen graph from a Graph.
+
+        Vertex ids follow the order of graph.vertices(). Edges whose element
+        is None are given a weight of 1.
+
+        Args:
+            graph - a Graph object
+            coords - optional dict of vertex -> (lat, long)
+        """
+        vertices = graph.vertices()
+        index = {v: i for i, v in enumerate(vertices)}
+        labels = [v.element() for v in vertices]
+        offsets = array('q', [0])
+        targets = array('i')
+        weights = array('d')
+        for v in vertices:
+            for e in graph.get_edges(v):
+                targets.append(index[e.opposite(v)])
+                weight = e.element()
+                weights.append(1 if weight is None else weight)
+            offsets.append(len(targets))
+        lats = longs = None
+        if coords is not None:
+            lats = array('d', (coords[v][0] for v in vertices))
+            longs = array('d', (coords[v][1] for v in vertices))
+        return cls(labels, offsets, targets, weights, lats, longs)
+
+    def arrays(self):
+        """ Return the (labels, offsets, targets, weights, lats, longs) arrays. """
+        return (self._labels, self._offsets, self._targets, self._weights,
+                self._lats, self._longs)
+
+    def __str__(self):
+        """ Return a string representation of the graph. """
+        return ('|V| = ' + str(self.num_vertices())
+                + '; |E| = ' + str(self.num_edges()) + ' (frozen)')
+
+    # -----------------------------------------------------------------------#
+
+    # ADT methods to query the graph
+
+    def num_vertices(self):
+        """ Return the number of vertices in the graph. """
+        return len(self._offsets) - 1
+
+    def num_edges(self):
+        """ Return the number of edges in the graph. """
+        return len(self._targets) // 2
+
+    def vertices(self):
+        """ Return the range of vertex ids. """
+        return range(self.num_vertices())
+
+    def element(self, v):
+        """ Return the label of vertex id v. """
+        return self._labels[v]
+
+    def get_vertex_by_label(self, element):
+        """ Return the id of the first vertex that matches element, or None. """
+        if self._ids is None:
+            ids = dict()
+            for i, label in enumerate(self._labels):
+                ids.setdefault(label, i)
+            self._ids = ids
+        return self._ids.get(element)
+
+    def get_edges(self, v):
+        """ Return a list of (neighbour, weight) pairs for vertex id v. """
+        start, end = self._offsets[v], self._offsets[v + 1]
+        return list(zip(self._targets[start:end], self._weights[start:end]))
+
+    def degree(self, v):
+        """ Return the degree of vertex id v. """
+        return self._offsets[v + 1] - self._offsets[v]
+
+    def coordinates(self, v):
+        """ Return the (lat, long) of vertex id v, or None. """
+        if self._lats is None:
+            return None
+        return self._lats[v], self._longs[v]
+
+    def depthfirstsearch(self, v):
+        """ Return a dict of vertex id -> preceding id for a depth-first search.
+
+        Vertices are visited in the same order as Graph.depthfirstsearch.
+        """
+        offsets, targets = self._offsets, self._targets
+        marked = {v: None}
+        stack = [(v, offsets[v])]
+        while stack:
+            u, i = stack[-1]
+            if i == offsets[u + 1]:
+                stack.pop()
+                continue
+            stack[-1] = (u, i + 1)
+            w = targets[i]
+            if w not in marked:
+                marked[w] = u
+                stack.append((w, offsets[w]))
+        return marked
+
+    def breadthfirstsearch(self, v):
+        """ Return a dict of vertex id -> preceding id for a breadth-first search. """
+        offsets, targets = self._offsets, self._targets
+        marked = {v: None}
+        level = [v]
+        while level:
+            new_level = []
+            for u in level:
+                for i in range(offsets[u], offsets[u + 1]):
+                    w = targets[i]
+                    if w not in marked:
+                        marked[w] = u
+                        new_level.append(w)
+            level = new_level
+        return marked
+
+    def dijkstra(self, s, t=None):
+        """ Return a dict of vertex id -> (cost, preceding id) from s.
+
+        Same result shape as Graph.dijkstra, using a binary heap with lazy
+        deletion instead of an adaptable priority queue. If a target t is
+        given, the search stops as soon as t is settled.
+        """
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        closed = dict()
+        best = {s: 0}
+        preds = {s: None}
+        heap = [(0, s)]
+        while heap:
+            v_key, v = heappop(heap)
+            if v in closed:
+                continue
+            closed[v] = (v_key, preds[v])
+            if v == t:
+                break
+            for i in range(offsets[v], offsets[v + 1]):
+                w = targets[i]
+                if w not in closed:
+                    new_cost = v_key + weights[i]
+                    if w not in best or new_cost < best[w]:
+                        best[w] = new_cost
+                        preds[w] = v
+                        heappush(heap, (new_cost, w))
+        return closed
+
+    def bidirectional_dijkstra(self, s, t):
+        """ Return a dict of vertex id -> (cost, preceding id) for the path s to t.
+
+        Same result as Graph.bidirectional_dijkstra: only the vertices on the
+        shortest path, with costs from s, or an empty dict if t is unreachable.
+        """
+        if s == t:
+            return {s: (0, None)}
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        # one [heap, best, closed, preds] per direction: 0 forward, 1 backward
+        sides = [[[(0, s)], {s: 0}, dict(), {s: None}],
+                 [[(0, t)], {t: 0}, dict(), {t: None}]]
+        best_total = None
+        meet = None
+        while sides[0][0] and sides[1][0]:
+            for side in sides:  # drop entries that were superseded
+                while side[0] and side[0][0][1] in side[2]:
+                    heappop(side[0])
+            if not sides[0][0] or not sides[1][0]:
+                break
+            f_key, b_key = sides[0][0][0][0], sides[1][0][0][0]
+            if best_total is not None and f_key + b_key >= best_total:
+                break
+            d = 0 if f_key <= b_key else 1
+            heap, best, closed, preds = sides[d]
+            other_closed = sides[1 - d][2]
+            v_key, v = heappop(heap)
+            closed[v] = (v_key, preds[v])
+            if v in other_closed and (best_total is None
+                                      or v_key + other_closed[v][0] < best_total):
+                best_total = v_key + other_closed[v][0]
+                meet = (v, v)
+            for i in range(offsets[v], offsets[v + 1]):
+                w = targets[i]
+                if w not in closed:
+                    new_cost = v_key + weights[i]
+                    if w not in best or new_cost < best[w]:
+                        best[w] = new_cost
+                        preds[w] = v
+                        heappush(heap, (new_cost, w))
+                    if w in other_closed and (best_total is None
+                                              or new_cost + other_closed[w][0] < best_total):
+                        best_total = new_cost + other_closed[w][0]
+                        meet = (v, w) if d == 0 else (w, v)
+
+        path = dict()
+        if meet is None:
+            return path
+        forward, backward = sides[0][2], sides[1][2]
+        a, b = meet
+        chain = [a]
+        while forward[chain[-1]][1] is not None:
+            chain.append(forward[chain[-1]][1])
+        chain.reverse()
+        if b != a:
+            chain.append(b)
+        while backward[chain[-1]][1] is not None:
+            chain.append(backward[chain[-1]][1])
+        path[s] = (0, None)
+        for i in range(1, len(chain)):
+            u, w = chain[i - 1], chain[i]
+            path[w] = (path[u][0] + self._weight(u, w), u)
+        return path
+
+    def _weight(self, v, w):
+        """ Return the lowest weight of an edge from v to w. """
+        start, end = self._offsets[v], self._offsets[v + 1]
+        return min(self._weights[i] for i in range(start, end)
+                   if self._targets[i] == w)
+
+    def one_to_many(self, s, targets):
+        """ Return an array of path costs from s to each of targets.
+
+        The search stops once every target is settled. Unreachable targets
+        get infinity.
+
+        Args:
+            s - the source vertex id
+            targets - a sequence of vertex ids
+        """
+        offsets, targets_, weights = self._offsets, self._targets, self._weights
+        remaining = set(targets)
+        closed = dict()
+        best = {s: 0}
+        heap = [(0, s)]
+        while heap and remaining:
+            v_key, v = heappop(heap)
+            if v in closed:
+                continue
+            closed[v] = v_key
+            remaining.discard(v)
+            for i in range(offsets[v], offsets[v + 1]):
+                w = targets_[i]
+                if w not in closed:
+                    new_cost = v_key + weights[i]
+                    if w not in best or new_cost < best[w]:
+                        best[w] = new_cost
+                        heappush(heap, (new_cost, w))
+        inf = float('inf')
+        return array('d', (closed.get(t, inf) for t in targets))
+
+    def sp(self, v, w, dijkstra_dict=None):
+        """ Return the list of vertex ids on the shortest path from v to w.
+
+        Prints the path in the same format as RouteMap.sp if the graph has
+        coordinates. Like RouteMap.sp, prints an error and returns None if
+        there is no path.
+
+        Args:
+            v, w - vertex ids
+            dijkstra_dict - optional result of dijkstra(v)
+        """
+        paths = dijkstra_dict
+        if paths is None:
+            paths = self.dijkstra(v, w)
+        if w not in paths:
+            print("ERROR: No route between the vertices")
+            return None
+        pathing = [w]
+        while pathing[-1] != v:
+            pathing.append(paths[pathing[-1]][1])
+        pathing.reverse()
+        if self._lats is not None:
+            self.print_paths_for_GPS(paths, pathing)
+        return pathing
+
+    def print_paths(self, d_dict, file=None):
+        labels = self._labels
+        write_lines(tree_lines(d_dict, lambda v: str(None if v is None else labels[v])),
+                    file)
+
+    def print_paths_for_GPS(self, d, sp, file=None):
+        write_lines(tsv_lines(route_points(self, d, sp)), file)
+
+    def memory_usage(self):
+        """ Return the approximate number of bytes held by the graph. """
+        total = sys.getsizeof(self._labels)
+        for label in self._labels:
+            total += sys.getsizeof(label)
+        for arr in (self._offsets, self._targets, self._weights,
+                    self._lats, self._longs):
+            if arr is not None:
+                total += sys.getsizeof(arr)
+        return total
+
+
+def compare(graph, sources):
+    """ Compare the memory and dijkstra time of graph against its frozen copy.
+
+    Returns a dict with the byte counts of both representations, the time
+    taken to freeze, and the total dijkstra time over sources for each.
+
+    Args:
+        graph - a Graph or RouteMap object
+        sources - a list of vertex objects in graph
+    """
+    start = time.perf_counter()
+    frozen = graph.freeze()
+    freeze_time = time.perf_counter() - start
+    index = {v: i for i, v in enumerate(graph.vertices())}
+
+    start = time.perf_counter()
+    for s in sources:
+        graph.dijkstra(s)
+    graph_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for s in sources:
+        frozen.dijkstra(index[s])
+    frozen_time = time.perf_counter() - start
+
+    return {'vertices': graph.num_vertices(),
+            'edges': graph.num_edges(),
+            'graph_bytes': graph.memory_usage(),
+            'frozen_bytes': frozen.memory_usage(),
+            'freeze_seconds': freeze_time,
+            'graph_dijkstra_seconds': graph_time,
+            'frozen_dijkstra_seconds': frozen_time}
@@ -0,0 +1,17 @@
+from math import radians, sin, cos, asin, sqrt
+
+EARTH_RADIUS = 6371008.8  # mean radius, in metres
+
+
+def haversine(lat1, long1, lat2, long2):
+    """ Return the great-circle distance in metres between two GPS points.
+
+    Args:
+        lat1, long1 - the first point, in degrees
+        lat2, long2 - the second point, in degrees
+    """
+    phi1, phi2 = radians(lat1), radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = radians(long2 - long1)
+    a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS * asin(min(1.0, sqrt(a)))
@@ -1,12 +1,26 @@
 from Vertex import *
 from Edge import *
 from AdaptablePriorityQueue import *
+from PriorityQueues import *
+from FrozenGraph import *
+from Eccentricity import *
+from SearchStats import *
+from RouteExport import *
+from Components import *
+from heapq import heappush, heappop
+import sys
+import weakref
 
 class Graph:
 
     def __init__(self):
         """ Create an initial empty graph. """
         self._structure = dict()
+        self._labels = dict()  # element -> first vertex added with it
+        self._degree_sum = 0  # sum of len(self._structure[v]) over all v
+        self._trees = weakref.WeakSet()  # DynamicShortestPathTrees to repair
+        self._components = None  # a ComponentIndex, built by component_index()
+        self.search_hook = None  # called with SearchStats after each dijkstra
 
     def __str__(self):
         """ Return a string representation of the graph. """
@@ -31,12 +45,19 @@ class Graph:
         return marked
 
     def _depthfirstsearch(self, v, marked):
-        for e in self.get_edges(v):
-            w = e.opposite(v)
-            if w not in marked:
-                marked[w] = e
-                self._depthfirstsearch(w, marked)
-
+        # an explicit stack of edge iterators visits vertices in the same
+        # order as recursion would, without Python's recursion limit
+        stack = [(v, iter(self.get_edges(v)))]
+        while stack:
+            v, edges = stack[-1]
+            for e in edges:
+                w = e.opposite(v)
+                if w not in marked:
+                    marked[w] = e
+                    stack.append((w, iter(self.get_edges(w))))
+                    break
+            else:
+                stack.pop()
 
     def breadthfirstsearch(self, v):
         marked = {v:None}
@@ -45,24 +66,56 @@ class Graph:
         return marked
 
     def _breadthfirstsearch(self, marked, levels, level):
-        new_level = level + 1
-        new_list = list()
-        for v in levels[level]:
-            for e in self.get_edges(v):
-                w = e.opposite(v)
-                if w not in marked:
-                    marked[w] = e
-                    new_list.append(w)
-        if len(new_list) > 0:
-            levels.append(new_list)
-            self._breadthfirstsearch(marked, levels, new_level)
+        while level < len(levels):
+            new_list = list()
+            for v in levels[level]:
+                for e in self.get_edges(v):
+                    w = e.opposite(v)
+                    if w not in marked:
+                        marked[w] = e
+                        new_list.append(w)
+            if len(new_list) > 0:
+                levels.append(new_list)
+            level += 1
 
     def num_vertices(self):
         """ Return the number of vertices in the graph. """
         return len(self._structure)
 
-    def dijkstra(self, s):
-        APQ = AdaptablePriorityQueue()  # 'open'
+    def dijkstra(self, s, t=None, queue=None, weight=None, stats=None, limit=None):
+        """ Return a dict of vertex -> (cost, preceding vertex) from s.
+
+        If a target t is given, the search stops as soon as t is settled, so
+        the dict only holds the vertices settled up to that point. Likewise,
+        with a limit the search stops before settling anything that costs
+        more, so its work grows with the region within the limit rather
+        than with the graph.
+
+        Args:
+            s - the source vertex
+            t - an optional target vertex
+            queue - the priority queue to use, as accepted by
+                PriorityQueues.make_queue; defaults to AdaptablePriorityQueue
+            weight - optional function giving the cost of an edge; defaults
+                to the edge element
+            stats - optional SearchStats to fill in; if omitted and
+                self.search_hook is set, new stats are passed to the hook
+            limit - optional largest cost to settle
+        """
+        if weight is None:
+            weight = Edge.element
+        if limit is None:
+            limit = float('inf')
+        if stats is None and self.search_hook is not None:
+            stats = SearchStats(self.search_hook)
+        if stats is not None:
+            stats.source, stats.target = s, t
+            stats.phase('setup')
+        APQ = make_queue(queue)  # 'open'
+        if stats is not None:
+            APQ = CountingQueue(APQ, stats)
+            weight = stats.weight(weight)
+            stats.phase('search')
         locs = dict()
         closed = dict()
         preds = {s: None}
@@ -70,36 +123,227 @@ class Graph:
 
         while not APQ.empty():
             v, v_key = APQ.remove_min()
+            if v_key > limit:
+                break
             v_el = locs.pop(v)
             predecessor = preds.pop(v)
             closed[v] = (v_key, predecessor)
+            if v == t:
+                break
             for e in self.get_edges(v):
                 w = e.opposite(v)
                 if w not in closed:
-                    new_cost = v_key + e.element()
+                    new_cost = v_key + weight(e)
                     if w not in locs:
                         preds[w] = v
                         locs[w] = APQ.add(new_cost, w)
                     elif APQ.get_key(locs[w]) > new_cost:
                         preds[w] = v
                         APQ.update_key(locs[w], new_cost)
+        if stats is not None:
+            stats.settled += len(closed)
+            stats.finish()
         return closed
 
-    def print_paths(self, d_dict):
-        for i in d_dict.keys():
-            vertex = str(i)
-            vals = d_dict[i]
-            cost = str(vals[0])
-            preceding = str(vals[1])
-            print("Vertex: " + vertex + "; Cost: " + cost + "; Preceding Vertex: " + preceding)
+    def multi_source_dijkstra(self, sources, queue=None, weight=None, limit=None):
+        """ Return a dict of vertex -> (cost, preceding vertex, nearest source).
+
+        One dijkstra pass with every source in the queue at cost 0, so each
+        vertex is settled from whichever source is nearest to it: the
+        answer to "which depot is closest to each vertex" for all vertices
+        at once, for the price of a single search. The first two fields
+        have the same meaning as in dijkstra, so the result can be passed
+        to RouteMap.sp with the nearest source as the start of the path.
+
+        Args:
+            sources - an iterable of source vertices, such as facilities
+            queue - the priority queue to use, as accepted by
+                PriorityQueues.make_queue; defaults to AdaptablePriorityQueue
+            weight - optional function giving the cost of an edge; defaults
+                to the edge element
+            limit - optional largest cost to settle
+        """
+        if weight is None:
+            weight = Edge.element
+        if limit is None:
+            limit = float('inf')
+        APQ = make_queue(queue)
+        locs = dict()
+        closed = dict()
+        preds = dict()  # vertex -> (preceding vertex, source) while open
+        for s in sources:
+            if s not in locs:
+                preds[s] = (None, s)
+                locs[s] = APQ.add(0, s)
+
+        while not APQ.empty():
+            v, v_key = APQ.remove_min()
+            if v_key > limit:
+                break
+            locs.pop(v)
+            predecessor, source = preds.pop(v)
+            closed[v] = (v_key, predecessor, source)
+            for e in self.get_edges(v):
+                w = e.opposite(v)
+                if w not in closed:
+                    new_cost = v_key + weight(e)
+                    if w not in locs:
+                        preds[w] = (v, source)
+                        locs[w] = APQ.add(new_cost, w)
+                    elif APQ.get_key(locs[w]) > new_cost:
+                        preds[w] = (v, source)
+                        APQ.update_key(locs[w], new_cost)
+        return closed
+
+    def voronoi_cells(self, sources, weight=None, limit=None):
+        """ Return a dict of source -> list of the vertices nearest to it.
+
+        The graph Voronoi partition of the sources, from one
+        multi_source_dijkstra pass. Vertices no source can reach, or reach
+        within limit, are left out.
+        """
+        sources = list(sources)  # read twice, so a generator must not run dry
+        cells = {s: [] for s in sources}
+        for v, (_, _, source) in self.multi_source_dijkstra(sources, weight=weight,
+                                                            limit=limit).items():
+            cells[source].append(v)
+        return cells
+
+    def k_nearest_sources(self, sources, k, weight=None, limit=None):
+        """ Return a dict of vertex -> its k nearest sources, cheapest first.
+
+        Each vertex gets a list of up to k (cost, preceding vertex, source)
+        entries, for different sources.
+        The search settles (vertex, source) labels in cost order and stops
+        spreading a source through a vertex that already has k nearer ones:
+        a source cannot be among the k nearest of any vertex beyond it, as
+        those k are nearer there too. The work is about k single searches,
+        shared across all the sources.
+
+        To follow the path to the i-th source of v, step to the preceding
+        vertex and look for the entry with the same source there.
+
+        Args:
+            sources - an iterable of source vertices, such as facilities
+            k - the number of nearest sources wanted per vertex
+            weight - optional function giving the cost of an edge; defaults
+                to the edge element
+            limit - optional largest cost to settle
+        """
+        if weight is None:
+            weight = Edge.element
+        if limit is None:
+            limit = float('inf')
+        found = dict()  # vertex -> list of (cost, pred, source), settled so far
+        reached = set()  # (vertex, source) pairs settled
+        heap = []
+        tie = 0
+        for s in sources:
+            heappush(heap, (0, tie, s, None, s))
+            tie += 1
+        while heap:
+            cost, _, v, pred, source = heappop(heap)
+            if cost > limit:
+                break
+            labels = found.setdefault(v, [])
+            if len(labels) >= k or (v, source) in reached:
+                continue
+            reached.add((v, source))
+            labels.append((cost, pred, source))
+            for e in self.get_edges(v):
+                w = e.opposite(v)
+                if (w, source) not in reached and len(found.get(w, ())) < k:
+                    tie += 1
+                    heappush(heap, (cost + weight(e), tie, w, v, source))
+        return found
+
+    def bidirectional_dijkstra(self, s, t, queue=None):
+        """ Return a dict of vertex -> (cost, preceding vertex) for the path s to t.
+
+        Searches forward from s and backward from t at the same time, always
+        expanding the side with the smaller key, and stops once the two keys
+        add up to at least the best meeting cost found. The dict only holds
+        the vertices on the shortest path, with costs measured from s, so it
+        can be passed to RouteMap.sp. It is empty if t is unreachable.
+
+        Args:
+            s - the source vertex
+            t - the target vertex
+            queue - the priority queue to use, as for dijkstra
+        """
+        if s == t:
+            return {s: (0, None)}
+        # one [APQ, locs, closed, preds] per direction: 0 forward, 1 backward
+        sides = [[make_queue(queue), dict(), dict(), {s: None}],
+                 [make_queue(queue), dict(), dict(), {t: None}]]
+        sides[0][1][s] = sides[0][0].add(0, s)
+        sides[1][1][t] = sides[1][0].add(0, t)
+        best = None
+        meet = None  # (last vertex of forward half, first of backward half)
+
+        while not sides[0][0].empty() and not sides[1][0].empty():
+            f_key = sides[0][0].get_key(sides[0][0].min())
+            b_key = sides[1][0].get_key(sides[1][0].min())
+            if best is not None and f_key + b_key >= best:
+                break
+            side = 0 if f_key <= b_key else 1
+            APQ, locs, closed, preds = sides[side]
+            other_closed = sides[1 - side][2]
+            v, v_key = APQ.remove_min()
+            locs.pop(v)
+            closed[v] = (v_key, preds.pop(v))
+            if v in other_closed and (best is None
+                                      or v_key + other_closed[v][0] < best):
+                best = v_key + other_closed[v][0]
+                meet = (v, v)
+            for e in self.get_edges(v):
+                w = e.opposite(v)
+                if w not in closed:
+                    new_cost = v_key + e.element()
+                    if w not in locs:
+                        preds[w] = v
+                        locs[w] = APQ.add(new_cost, w)
+                    elif APQ.get_key(locs[w]) > new_cost:
+                        preds[w] = v
+                        APQ.update_key(locs[w], new_cost)
+                    if w in other_closed and (best is None
+                                              or new_cost + other_closed[w][0] < best):
+                        best = new_cost + other_closed[w][0]
+                        meet = (v, w) if side == 0 else (w, v)
+
+        path = dict()
+        if meet is None:
+            return path
+        forward, backward = sides[0][2], sides[1][2]
+        a, b = meet
+        # walk back from a to s, then out from b to t
+        chain = [a]
+        while forward[chain[-1]][1] is not None:
+            chain.append(forward[chain[-1]][1])
+        chain.reverse()
+        if b != a:
+            chain.append(b)
+        while backward[chain[-1]][1] is not None:
+            chain.append(backward[chain[-1]][1])
+        path[s] = (0, None)
+        for i in range(1, len(chain)):
+            u, w = chain[i - 1], chain[i]
+            path[w] = (path[u][0] + self.get_edge(u, w).element(), u)
+        return path
+
+    def print_paths(self, d_dict, file=None):
+        """ Print each vertex of a dijkstra dict with its cost and predecessor.
+
+        The lines are streamed through one buffer to file, sys.stdout by
+        default (see RouteExport.tree_lines).
+        """
+        write_lines(tree_lines(d_dict), file)
 
     def num_edges(self):
         """ Return the number of edges in the graph. """
-        num = 0
-        for v in self._structure:
-            num += len(self._structure[v])  # the dict of edges for v
-        return num // 2  # divide by 2, since each edege appears in the
-        # vertex list for both of its vertices
+        # kept up to date by add_edge; each edge appears in the dicts of
+        # both of its vertices, so halve the sum
+        return self._degree_sum // 2
 
     def vertices(self):
         """ Return a list of all vertices in the graph. """
@@ -107,33 +351,35 @@ class Graph:
 
     def get_vertex_by_label(self, element):
         """ Return the first vertex that matches element. """
-        for v in self._structure:
-            if v.element() == element:
-                return v
-        return None
+        try:
+            return self._labels.get(element)
+        except TypeError:  # unhashable elements are not indexed
+            for v in self._structure:
+                if v.element() == element:
+                    return v
+            return None
 
     def edges(self):
-        """ Return a list of all edges in the graph. """
-        edgelist = []
-        for v in self._structure:
-            for w in self._structure[v]:
+        """ Return an iterator over all edges in the graph. """
+        for v, incident in self._structure.items():
+            for e in incident.values():
                 # to avoid duplicates, only return if v is the first vertex
-                if self._structure[v][w].start() == v:
-                    edgelist.append(self._structure[v][w])
-        return edgelist
+                if e.start() is v:
+                    yield e
 
     def get_edges(self, v):
-        """ Return a list of all edges incident on v.
+        """ Return a view of all edges incident on v, or None if v is not in the graph.
+
+        The view is not a copy: it reflects later changes to v's edges, and
+        must not be iterated while edges are added to v.
 
         Args:
             v - a vertex object
         """
-        if v in self._structure:
-            edgelist = []
-            for w in self._structure[v]:
-                edgelist.append(self._structure[v][w])
-            return edgelist
-        return None
+        incident = self._structure.get(v)
+        if incident is None:
+            return None
+        return incident.values()
 
     def get_edge(self, v, w):
         """ Return the edge between v and w, or None.
@@ -148,6 +394,54 @@ class Graph:
             return self._structure[v][w]
         return None
 
+    def memory_usage(self):
+        """ Return the approximate number of bytes held by the graph.
+
+        Counts the adjacency dicts, the vertex and edge objects and their
+        attributes, but not the vertex or edge elements themselves.
+        """
+        return self.memory_report()['total']
+
+    def memory_report(self):
+        """ Return a dict of the approximate bytes held by each structure.
+
+        Besides a byte count per structure and the total, it gives the
+        average bytes per vertex and per edge, for estimating the memory a
+        larger map will need. Elements themselves are not counted.
+        """
+        structure = self._structure
+        adjacency = sys.getsizeof(structure)
+        vertices = 0
+        edges = 0
+        for v, incident in structure.items():
+            vertices += sys.getsizeof(v)
+            adjacency += sys.getsizeof(incident)
+            for e in incident.values():
+                if e.start() is v:  # count each edge once
+                    edges += sys.getsizeof(e) + sys.getsizeof(e.vertices())
+        report = {'adjacency': adjacency,
+                  'vertices': vertices,
+                  'edges': edges,
+                  'labels': sys.getsizeof(self._labels)}
+        return self._summarise(report)
+
+    def _summarise(self, report):
+        """ Add the total and per-vertex and per-edge averages to a memory report. """
+        total = sum(report.values())
+        num_vertices, num_edges = self.num_vertices(), self.num_edges()
+        report['total'] = total
+        report['bytes_per_vertex'] = total / num_vertices if num_vertices else 0.0
+        report['bytes_per_edge'] = total / num_edges if num_edges else 0.0
+        return report
+
+    def freeze(self):
+        """ Return an immutable compressed-sparse-row copy of the graph.
+
+        The copy numbers the vertices 0..n-1 in the order of vertices(), and
+        does not see any later changes to this graph. See FrozenGraph.
+        """
+        return FrozenGraph.from_graph(self)
+
     def degree(self, v):
         """ Return the degree of vertex v.
 
@@ -156,6 +450,29 @@ class Graph:
         """
         return len(self._structure[v])
 
+    def component_index(self):
+        """ Return the ComponentIndex of the graph, building it on first use.
+
+        Once built, it is kept up to date as vertices and edges are added
+        or removed, and RouteMap queries between vertices in different
+        components are rejected without a search.
+        """
+        if self._components is None:
+            self._components = ComponentIndex(self)
+        return self._components
+
+    def reachable(self, v, w):
+        """ Return True if there is a path between v and w.
+
+        Answered in O(1) from component_index(), which is built by the
+        first call if it does not exist yet.
+
+        Args:
+            v - a vertex object
+            w - a vertex object
+        """
+        return self.component_index().reachable(v, w)
+
     # ----------------------------------------------------------------------#
 
     # ADT methods to modify the graph
@@ -168,6 +485,12 @@ class Graph:
         """
         v = Vertex(element)
         self._structure[v] = dict()
+        if self._components is not None:
+            self._components.add_vertex(v)
+        try:
+            self._labels.setdefault(element, v)
+        except TypeError:
+            pass
         return v
 
     def add_vertex_if_new(self, element):
@@ -182,9 +505,9 @@ class Graph:
         separate methods need to be written.
 
         """
-        for v in self._structure:
-            if v.element() == element:
-                return v
+        v = self.get_vertex_by_label(element)
+        if v is not None:
+            return v
         return self.add_vertex(element)
 
     def add_edge(self, v, w, element):
@@ -201,12 +524,145 @@ class Graph:
             w - a vertex object
             element - a label
         """
+        added = self._insert_edge(v, w, element)
+        if added is None:
+            return None
+        e, old = added
+        self._edge_added(e, old)
+        return e
+
+    def _insert_edge(self, v, w, element):
+        """ Put a new edge between v and w in the structure.
+
+        Returns (edge, the edge it replaced or None), or None if v or w is
+        not in the graph. Tracked trees are not repaired; subclasses that
+        keep their own records of edges fill them in and then call
+        _edge_added, so a tree weighted by those records can read them.
+        """
         if v not in self._structure or w not in self._structure:
             return None
+        old = self._structure[v].get(w)
         e = Edge(v, w, element)
         self._structure[v][w] = e
         self._structure[w][v] = e
-        return e
+        if old is None:
+            self._degree_sum += 1 if v is w else 2
+        if self._components is not None:
+            self._components.add_edge(v, w)
+        return e, old
+
+    def _edge_added(self, e, old):
+        """ Repair the tracked trees after e was added in place of old (or None). """
+        if self._trees:
+            old_weight = float('inf') if old is None else old.element()
+            self._weights_changed([(e, old_weight)])
+
+    def remove_vertex(self, v):
+        """ Remove v and its edges from the graph, and return the edges removed.
+
+        Returns None if v is not in the graph.
+
+        Args:
+            v - a vertex object
+        """
+        if v not in self._structure:
+            return None
+        return self.remove_vertices([v])
+
+    def remove_vertices(self, vertices):
+        """ Remove several vertices and their edges, and return the edges removed.
+
+        Tracked trees are repaired once for the whole batch, and the
+        component index, if built, is rebuilt once. Vertices not in the
+        graph are ignored.
+
+        Args:
+            vertices - an iterable of vertex objects
+        """
+        structure = self._structure
+        vertices = [v for v in dict.fromkeys(vertices) if v in structure]
+        removed = []
+        for v in vertices:
+            incident = structure.pop(v)
+            for w, e in incident.items():
+                removed.append(e)
+                if w is not v:
+                    del structure[w][v]
+                    self._degree_sum -= 1
+            self._degree_sum -= len(incident)
+            try:
+                if self._labels.get(v.element()) is v:
+                    del self._labels[v.element()]
+            except TypeError:
+                pass
+        if vertices:
+            for tree in list(self._trees):
+                tree.remove_vertices(vertices)
+            if self._components is not None:
+                self._components = ComponentIndex(self)
+        return removed
+
+    def prune_to_largest_component(self, strong=False):
+        """ Remove every vertex outside the largest component, and return how many.
+
+        Args:
+            strong - if True, keep the largest strongly connected component
+                instead, so that every route left is possible in both
+                directions along one-way roads
+        """
+        index = self.component_index()
+        keep = index.largest_strong() if strong else index.largest()
+        removed = [v for v in self._structure if v not in keep]
+        self.remove_vertices(removed)
+        return len(removed)
+
+    def update_edge_weight(self, v, w, element):
+        """ Set the element of the edge between v and w, and return the edge.
+
+        Unlike add_edge, the Edge object is kept, and any tracked
+        DynamicShortestPathTree is repaired incrementally. Returns None if
+        there is no such edge.
+
+        Args:
+            v - a vertex object
+            w - a vertex object
+            element - the new weight
+        """
+        return self.update_edge_weights([(v, w, element)])[0]
+
+    def update_edge_weights(self, changes):
+        """ Set several edge weights at once, and return the edges.
+
+        Tracked trees are repaired once for the whole batch. The result has
+        None in place of any pair that is not an edge.
+
+        Args:
+            changes - a list of (v, w, element) triples
+        """
+        edges = []
+        old = dict()  # edge -> weight before this batch
+        for v, w, element in changes:
+            e = self.get_edge(v, w)
+            edges.append(e)
+            if e is not None:
+                old.setdefault(e, e.element())
+                e.set_element(element)
+        if old:
+            self._weights_changed(list(old.items()))
+        return edges
+
+    def _weights_changed(self, changes):
+        """ Repair the tracked trees after a list of (edge, old element) changes. """
+        for tree in list(self._trees):
+            tree.repair(changes)
+
+    def track_tree(self, tree):
+        """ Have tree.repair(changes) called whenever edge weights change.
+
+        Only a weak reference is kept, so tracking stops once the tree is
+        no longer used elsewhere.
+        """
+        self._trees.add(tree)
 
     def add_edge_pairs(self, elist):
         """ add all vertex pairs in elist as edges with empty elements.
@@ -238,17 +694,18 @@ class Graph:
         return marked
 
     def _BFS_logged(self, marked, levels, level):
-        new_level = level + 1
-        new_list = list()
-        for v in levels[level]:
-            for e in self.get_edges(v):
-                w = e.opposite(v)
-                if w not in marked:
-                    marked[w] = [e, new_level]
-                    new_list.append(w)
-        if len(new_list) > 0:
-            levels.append(new_list)
-            self._BFS_logged(marked, levels, new_level)
+        while level < len(levels):
+            new_level = level + 1
+            new_list = list()
+            for v in levels[level]:
+                for e in self.get_edges(v):
+                    w = e.opposite(v)
+                    if w not in marked:
+                        marked[w] = [e, new_level]
+                        new_list.append(w)
+            if len(new_list) > 0:
+                levels.append(new_list)
+            level = new_level
 
     def total_steps(self, v):
         log = self.BFS_logged(v)
@@ -270,6 +727,21 @@ class Graph:
                     dist = i[1][1]
         return furthest, dist
 
+    def furthest_v_weighted(self, v):
+        """ Return the vertex with the highest path cost from v, and that cost.
+
+        The weighted counterpart of furthest_v: follows edge elements with
+        dijkstra rather than counting BFS hops. Returns (None, -1) if no
+        other vertex is reachable.
+        """
+        furthest = None
+        dist = -1
+        for w, (cost, pred) in self.dijkstra(v).items():
+            if pred is not None and cost > dist:
+                furthest = w
+                dist = cost
+        return furthest, dist
+
     def path_length(self, v1, v2):
         marked = {v1: None}
         levels = [[v1]]
@@ -277,28 +749,52 @@ class Graph:
         return found, length
 
     def _path_length(self, marked, levels, level, v2):
-        new_level = level + 1
-        new_list = list()
-        found, length = False, 0
-        for v in levels[level]:
-            if v == v2:
-                return True, level
-            for e in self.get_edges(v):
-                w = e.opposite(v)
-                if w not in marked:
-                    marked[w] = e
-                    new_list.append(w)
-        if len(new_list) > 0 and found is False:
-            levels.append(new_list)
-            found, length = self._path_length(marked, levels, new_level, v2)
-        return found, length
+        while level < len(levels):
+            new_list = list()
+            for v in levels[level]:
+                if v == v2:
+                    return True, level
+                for e in self.get_edges(v):
+                    w = e.opposite(v)
+                    if w not in marked:
+                        marked[w] = e
+                        new_list.append(w)
+            if len(new_list) > 0:
+                levels.append(new_list)
+            level += 1
+        return False, 0
+
+    def central_vertex(self, processes=1, samples=None):
+        """ Return the fewest steps to a furthest vertex, and the vertices that achieve it.
+
+        Steps are BFS hops as in furthest_v, and an isolated vertex counts
+        -1. Eccentricities are found 64 vertices at a time by a bit-parallel
+        BFS over the frozen graph (see Eccentricity.py), spread over
+        processes worker processes.
+
+        With samples set, only that many BFSes are run, and the result is
+        approximate: fewest is an upper bound on the true value, and the
+        vertex list holds every vertex that could still be central, so it
+        always includes the exact answer.
 
-    def central_vertex(self):
+        Args:
+            processes - the number of worker processes; None uses every CPU
+            samples - the number of BFSes for an approximate answer, or None
+        """
+        frozen = self.freeze()
+        vertices = list(self._structure)
+        if samples is None:
+            ecc = eccentricities(frozen, processes=processes)
+        else:
+            lower, upper = eccentricity_bounds(frozen, samples)
+            if not vertices:
+                return 0, None
+            fewest = min(upper)
+            return fewest, [vertices[i] for i in range(len(vertices))
+                            if lower[i] <= fewest]
         fewest = 0  # fewest steps
         v = None  # list of vertices that have shortest paths to furthest vertex
-        for i in self._structure:
-            furthest = self.furthest_v(i)
-            steps = furthest[1]
+        for i, steps in zip(vertices, ecc):
             if v is None or steps < fewest:
                 fewest = steps
                 v = [i]
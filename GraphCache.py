@@ -0,0 +1,227 @@
+from array import array
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import sys
+
+from FrozenGraph import *
+from MapLoader import *
+
+MAGIC = b'RMGRAPH\0'
+VERSION = 1
+
+HAS_COORDS = 1  # header flags
+PICKLED_LABELS = 2
+BIG_ENDIAN = 4
+
+# magic, version, flags, vertices, targets, label bytes, source size,
+# source mtime (ns), source sha256
+HEADER = struct.Struct('=8sIIqqqqq32s')
+
+CACHE_SUFFIX = '.rmgc'
+
+
+def _pad(size):
+    """ Return the number of bytes needed to align size to 8. """
+    return -size % 8
+
+
+def source_key(filename, digest=True):
+    """ Return (size, mtime in ns, sha256) of filename; sha256 only if digest. """
+    st = os.stat(filename)
+    sha = b''
+    if digest:
+        h = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        sha = h.digest()
+    return st.st_size, st.st_mtime_ns, sha
+
+
+def _sections(frozen):
+    """ Return the flags and the list of byte buffers that make up frozen. """
+    flags = BIG_ENDIAN if sys.byteorder == 'big' else 0
+    labels, offsets, targets, weights, lats, longs = frozen.arrays()
+    try:
+        label_bytes = memoryview(array('q', labels)).cast('B')
+    except (TypeError, OverflowError):  # not all labels fit in an int64
+        label_bytes = pickle.dumps(list(labels), pickle.HIGHEST_PROTOCOL)
+        flags |= PICKLED_LABELS
+    sections = [label_bytes]
+    if lats is not None:
+        flags |= HAS_COORDS
+        sections += [lats, longs]
+    sections += [offsets, targets, weights]
+    return flags, [memoryview(s).cast('B') if not isinstance(s, bytes) else s
+                   for s in sections]
+
+
+def graph_size(frozen):
+    """ Return the number of bytes write_graph will use for frozen. """
+    _, sections = _sections(frozen)
+    return HEADER.size + sum(len(s) + _pad(len(s)) for s in sections)
+
+
+def write_graph(frozen, f, key=(0, 0, b'')):
+    """ Write frozen to the binary file object f.
+
+    The layout is a fixed header followed by the label, latitude,
+    longitude, offset, target and weight sections, each padded to 8 bytes
+    so that it can be viewed in place with memoryview.cast.
+
+    Args:
+        frozen - a FrozenGraph object
+        f - a file object opened for binary writing
+        key - the (size, mtime, sha256) of the source file, from source_key
+    """
+    flags, sections = _sections(frozen)
+    label_size = len(sections[0])
+    num_targets = len(frozen.arrays()[2])
+    size, mtime, sha = key
+    f.write(HEADER.pack(MAGIC, VERSION, flags, frozen.num_vertices(),
+                        num_targets, label_size, size, mtime, sha))
+    for s in sections:
+        f.write(s)
+        f.write(b'\0' * _pad(len(s)))
+
+
+def read_header(buffer):
+    """ Return the header fields of a graph buffer, or None if it is not one. """
+    if len(buffer) < HEADER.size:
+        return None
+    fields = HEADER.unpack_from(buffer, 0)
+    flags = fields[2]
+    if (fields[0] != MAGIC or fields[1] != VERSION
+            or bool(flags & BIG_ENDIAN) != (sys.byteorder == 'big')):
+        return None
+    return fields
+
+
+def _refresh_header(filename, fields, key):
+    """ Record key as the source key in the header of the cache filename.
+
+    Only the header is rewritten, in one write, so processes that have the
+    cache mapped keep working. Failing to write, as in a read-only
+    directory, only means the source is hashed again next time.
+    """
+    size, mtime, sha = key
+    header = HEADER.pack(*fields[:6], size, mtime, sha)
+    try:
+        fd = os.open(filename, os.O_WRONLY)
+    except OSError:
+        return
+    try:
+        os.pwrite(fd, header, 0)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_graph(buffer, owner=None):
+    """ Return a FrozenGraph viewing the arrays in buffer without copying them.
+
+    Args:
+        buffer - a bytes-like object holding a graph written by write_graph
+        owner - an object, such as an mmap, to keep alive with the graph
+    """
+    fields = read_header(buffer)
+    if fields is None:
+        raise ValueError('Not a graph cache of version ' + str(VERSION))
+    _, _, flags, n, m, label_size = fields[:6]
+    view = memoryview(buffer)
+    pos = HEADER.size
+
+    def take(size, fmt):
+        nonlocal pos
+        section = view[pos:pos + size]
+        pos += size + _pad(size)
+        return section if fmt is None else section.cast(fmt)
+
+    if flags & PICKLED_LABELS:
+        labels = pickle.loads(take(label_size, None))
+    else:
+        labels = take(label_size, 'q')
+    lats = longs = None
+    if flags & HAS_COORDS:
+        lats = take(8 * n, 'd')
+        longs = take(8 * n, 'd')
+    offsets = take(8 * (n + 1), 'q')
+    targets = take(4 * m, 'i')
+    weights = take(8 * m, 'd')
+    return FrozenGraph(labels, offsets, targets, weights, lats, longs, owner)
+
+
+def write_cache(frozen, filename, source=None):
+    """ Write frozen to the cache file filename, atomically.
+
+    Args:
+        frozen - a FrozenGraph object
+        filename - the cache file to write
+        source - optional map file the cache is built from, whose size,
+            mtime and hash are recorded to check the cache later
+    """
+    key = source_key(source) if source is not None else (0, 0, b'')
+    tmp = filename + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp, 'wb') as f:
+        write_graph(frozen, f, key)
+    os.replace(tmp, filename)
+
+
+def open_cache(filename, source=None):
+    """ Return a FrozenGraph memory-mapped from filename, or None.
+
+    Returns None if the file is missing, is not a cache of this version, or
+    was built from a different version of source. The mapping is read-only
+    and shared, so every process that opens the same cache shares its pages.
+
+    Args:
+        filename - the cache file
+        source - optional map file the cache should have been built from
+    """
+    try:
+        with open(filename, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # missing, or empty
+        return None
+    fields = read_header(mm)
+    if fields is None:
+        mm.close()
+        return None
+    if source is not None:
+        size, mtime, _ = source_key(source, digest=False)
+        if (size, mtime) != (fields[6], fields[7]):
+            # touched but possibly unchanged: fall back to the content hash
+            key = source_key(source)
+            if key[2] != fields[8]:
+                mm.close()
+                return None
+            # unchanged after all, as after a checkout or copy: record the
+            # new size and mtime so later opens skip the hash
+            _refresh_header(filename, fields, key)
+    return read_graph(mm, mm)
+
+
+def load_frozen(filename, cache=None):
+    """ Return the map in filename as a memory-mapped FrozenGraph.
+
+    The first call parses the text map and writes a binary cache next to
+    it; later calls map the cache directly until the map file changes.
+
+    Args:
+        filename - a Node/Edge map file
+        cache - the cache file to use; defaults to filename + '.rmgc'
+    """
+    if cache is None:
+        cache = filename + CACHE_SUFFIX
+    frozen = open_cache(cache, filename)
+    if frozen is None:
+        graph, _, _ = load_routemap(filename)
+        frozen = graph.freeze()
+        write_cache(frozen, cache, filename)
+        # hand back the mapped copy, unless the map changed meanwhile
+        frozen = open_cache(cache, filename) or frozen
+    return frozen
@@ -0,0 +1,52 @@
+import concurrent.futures
+import multiprocessing
+
+_graph = None  # the FrozenGraph installed in a worker process
+_data = None  # anything else handed to the worker once, such as targets
+
+
+def _init_worker(graph, data):
+    """ Install the graph and data in a worker's globals. """
+    global _graph, _data
+    if isinstance(graph, str):
+        # imported here: SharedGraph depends, through GraphCache, on the
+        # modules that import this one
+        from SharedGraph import attach
+        graph = attach(graph)
+    _graph = graph
+    _data = data
+
+
+def worker_graph():
+    """ Return the graph installed in this worker process by graph_pool. """
+    return _graph
+
+
+def worker_data():
+    """ Return the data installed in this worker process by graph_pool. """
+    return _data
+
+
+def graph_pool(graph, processes, data=None, executor=False):
+    """ Return a process pool whose workers each have graph installed.
+
+    Work functions run in the pool read the graph with worker_graph() and
+    the data with worker_data(). Workers are forked where the platform
+    allows, so a FrozenGraph is inherited rather than pickled and every
+    worker shares the parent's copy. Elsewhere it is pickled to each
+    worker once, unless graph names a SharedGraph block to attach to.
+
+    Args:
+        graph - a FrozenGraph, or the name of a SharedGraph block
+        processes - the number of worker processes
+        data - optional picklable object to install alongside the graph
+        executor - if True, return a concurrent.futures.ProcessPoolExecutor,
+            as asyncio's run_in_executor needs, instead of a
+            multiprocessing.Pool
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    if executor:
+        return concurrent.futures.ProcessPoolExecutor(
+            processes, context, _init_worker, (graph, data))
+    return context.Pool(processes, _init_worker, (graph, data))
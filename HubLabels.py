@@ -0,0 +1,260 @@
+from array import array
+from heapq import heappush, heappop
+import pickle
+import time
+
+from ContractionHierarchy import *
+
+INF = float('inf')
+
+
+class HubLabels:
+    """ A hub-labelling distance oracle, built by pruned landmark labelling.
+
+        Every vertex gets a label: a list of (hub, cost) pairs such that
+        for any two vertices, some hub in both labels lies on a shortest
+        path between them. The cost between v and w is then the least
+        cost(v, hub) + cost(hub, w) over the hubs the two labels share,
+        found by merging them, with no search at all. Only costs are
+        answered, not paths.
+
+        Labels are built by running a Dijkstra search from each vertex in
+        turn, most important first. A search is pruned at any vertex whose
+        cost the labels built so far already answer, so the later, less
+        important vertices only reach a little way. Hubs are numbered by
+        their place in that order, so each label comes out sorted, and all
+        labels are kept in three compressed-sparse-row arrays.
+
+        The labels are a snapshot: they do not see later changes to the
+        graph. Edges whose element is None are given a weight of 1.
+    """
+
+    VERSION = 1
+
+    def __init__(self, graph):
+        """ Create empty labels for graph; call build() or load() next.
+
+        Args:
+            graph - a Graph or RouteMap object
+        """
+        self._graph = graph
+        self._vertices = graph.vertices()
+        self._index = {v: i for i, v in enumerate(self._vertices)}
+        self._order = None     # hub number -> vertex position
+        self._offsets = None   # the label of vertex i is at
+        self._hubs = None      # offsets[i]:offsets[i+1] in hubs and
+        self._costs = None     # costs, sorted by hub number
+        self.build_seconds = None
+
+    # -----------------------------------------------------------------------#
+
+    # Preprocessing
+
+    def build(self, order='ch'):
+        """ Label every vertex by pruned Dijkstra searches in the given order.
+
+        Args:
+            order - 'ch' to take vertices by decreasing ContractionHierarchy
+                rank, 'degree' to take them by decreasing degree, or a list
+                of all the vertices, most important first. Road maps have
+                few high-degree vertices, so 'degree' gives labels several
+                times larger, and takes longer to build even with the
+                hierarchy built first for 'ch'
+        """
+        start = time.perf_counter()
+        n = len(self._vertices)
+        index = self._index
+        adj = [[] for _ in range(n)]  # (neighbour position, weight)
+        for i, v in enumerate(self._vertices):
+            for e in self._graph.get_edges(v):
+                weight = 1 if e.element() is None else e.element()
+                adj[i].append((index[e.opposite(v)], weight))
+        ordering = self._ordering(order)
+
+        hubs = [[] for _ in range(n)]
+        costs = [[] for _ in range(n)]
+        root = [INF] * n  # hub number -> cost from the current root, via its label
+        for h, s in enumerate(ordering):
+            for hub, cost in zip(hubs[s], costs[s]):
+                root[hub] = cost
+            dist = {s: 0}
+            heap = [(0, s)]
+            while heap:
+                d, u = heappop(heap)
+                if d > dist[u]:
+                    continue
+                # prune u if the labels already give a path this cheap
+                pruned = False
+                for hub, cost in zip(hubs[u], costs[u]):
+                    if root[hub] + cost <= d:
+                        pruned = True
+                        break
+                if pruned:
+                    continue
+                hubs[u].append(h)
+                costs[u].append(d)
+                for x, weight in adj[u]:
+                    new_cost = d + weight
+                    if new_cost < dist.get(x, INF):
+                        dist[x] = new_cost
+                        heappush(heap, (new_cost, x))
+            for hub in hubs[s]:
+                root[hub] = INF
+
+        offsets = array('q', [0])
+        flat_hubs = array('i')
+        flat_costs = array('d')
+        for i in range(n):
+            flat_hubs.extend(hubs[i])
+            flat_costs.extend(costs[i])
+            offsets.append(len(flat_hubs))
+        self._order = array('i', ordering)
+        self._offsets, self._hubs, self._costs = offsets, flat_hubs, flat_costs
+        self.build_seconds = time.perf_counter() - start
+        return self
+
+    def _ordering(self, order):
+        """ Return the list of vertex positions, most important first. """
+        if order == 'degree':
+            degree = self._graph.degree
+            return sorted(range(len(self._vertices)),
+                          key=lambda i: -degree(self._vertices[i]))
+        if order == 'ch':
+            rank = ContractionHierarchy(self._graph).build()._rank
+            return sorted(range(len(self._vertices)), key=lambda i: -rank[i])
+        if isinstance(order, str):
+            raise ValueError('Unknown vertex order: ' + order)
+        ordering = [self._index[v] for v in order]
+        if sorted(ordering) != list(range(len(self._vertices))):
+            raise ValueError('The order must list every vertex exactly once')
+        return ordering
+
+    # -----------------------------------------------------------------------#
+
+    # Queries
+
+    def distance(self, v, w):
+        """ Return the cost of a shortest path between v and w, or infinity.
+
+        A merge of the two sorted labels.
+
+        Args:
+            v - a vertex object
+            w - a vertex object
+        """
+        offsets, hubs, costs = self._offsets, self._hubs, self._costs
+        i, j = self._index[v], self._index[w]
+        a, a_end = offsets[i], offsets[i + 1]
+        b, b_end = offsets[j], offsets[j + 1]
+        best = INF
+        while a < a_end and b < b_end:
+            ha, hb = hubs[a], hubs[b]
+            if ha == hb:
+                cost = costs[a] + costs[b]
+                if cost < best:
+                    best = cost
+                a += 1
+                b += 1
+            elif ha < hb:
+                a += 1
+            else:
+                b += 1
+        return best
+
+    def one_to_many(self, v, targets):
+        """ Return an array of the costs from v to each of targets.
+
+        v's label is spread into a dict once, so each target only costs a
+        pass over its own label. Unreachable targets cost infinity.
+
+        Args:
+            v - a vertex object
+            targets - a list of vertex objects
+        """
+        offsets, hubs, costs = self._offsets, self._hubs, self._costs
+        i = self._index[v]
+        source = dict(zip(hubs[offsets[i]:offsets[i + 1]],
+                          costs[offsets[i]:offsets[i + 1]]))
+        result = array('d')
+        for w in targets:
+            j = self._index[w]
+            best = INF
+            for b in range(offsets[j], offsets[j + 1]):
+                cost = source.get(hubs[b])
+                if cost is not None and cost + costs[b] < best:
+                    best = cost + costs[b]
+            result.append(best)
+        return result
+
+    def label(self, v):
+        """ Return the label of v as a list of (hub vertex, cost) pairs. """
+        i = self._index[v]
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return [(self._vertices[self._order[h]], c)
+                for h, c in zip(self._hubs[start:end], self._costs[start:end])]
+
+    def report(self):
+        """ Return a dict of the label sizes and the memory they take.
+
+        'entries' is the total number of (hub, cost) pairs, 'mean',
+        'median' and 'max' describe the label sizes, and 'bytes' counts
+        the label arrays, with 'bytes_per_vertex' for scaling to larger
+        maps. 'build_seconds' is the time build() took, if it was run.
+        """
+        offsets = self._offsets
+        n = len(offsets) - 1
+        sizes = sorted(offsets[i + 1] - offsets[i] for i in range(n))
+        size = sum(arr.itemsize * len(arr)
+                   for arr in (offsets, self._hubs, self._costs, self._order))
+        return {'vertices': n,
+                'entries': len(self._hubs),
+                'mean': len(self._hubs) / n if n else 0.0,
+                'median': sizes[n // 2] if n else 0,
+                'max': sizes[-1] if n else 0,
+                'bytes': size,
+                'bytes_per_vertex': size / n if n else 0.0,
+                'build_seconds': self.build_seconds}
+
+    # -----------------------------------------------------------------------#
+
+    # Persistence
+
+    def save(self, filename):
+        """ Write the labels to filename, keyed by vertex label. """
+        data = {'version': self.VERSION,
+                'labels': [v.element() for v in self._vertices],
+                'order': self._order,
+                'offsets': self._offsets,
+                'hubs': self._hubs,
+                'costs': self._costs}
+        with open(filename, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename, graph):
+        """ Return the hub labels saved in filename, attached to graph.
+
+        Vertices are matched to graph by label, so graph should be the same
+        map the labels were built from.
+
+        Args:
+            filename - a file written by save()
+            graph - a Graph or RouteMap object
+        """
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') != cls.VERSION:
+            raise ValueError('Unsupported hub label version: '
+                             + str(data.get('version')))
+        hl = cls.__new__(cls)
+        by_label = dict()
+        for v in graph.vertices():
+            by_label.setdefault(v.element(), v)
+        hl._graph = graph
+        hl._vertices = [by_label[label] for label in data['labels']]
+        hl._index = {v: i for i, v in enumerate(hl._vertices)}
+        hl._order = data['order']
+        hl._offsets, hl._hubs = data['offsets'], data['hubs']
+        hl._costs = data['costs']
+        hl.build_seconds = None
+        return hl
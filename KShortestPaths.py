@@ -0,0 +1,193 @@
+from heapq import heappush, heappop
+
+from Edge import *
+
+INF = float('inf')
+
+# Both methods need the cost of every vertex to the target, which one full
+# dijkstra from the target gives (edges are undirected, so the tree from the
+# target holds the costs to it). Removing or penalising edges only makes
+# paths dearer, so those costs stay a consistent lower bound, and each spur
+# search is an A* search that runs almost straight to the target.
+
+
+def _search(graph, s, t, dist, weight, blocked_vertices=(), blocked_edges=()):
+    """ Return (cost, path) from s to t avoiding the blocked vertices and edges.
+
+    An A* search guided by dist, the exact cost of each vertex to t in the
+    unmodified graph. Returns None if t cannot be reached.
+    """
+    if s not in dist:
+        return None
+    heap = [(dist[s], 0, 0, s)]  # (bound, -cost, tie, vertex): deepest first
+    tie = 0
+    best = {s: 0}
+    preds = {s: None}
+    closed = set()
+    while heap:
+        _, neg_cost, _, u = heappop(heap)
+        if u in closed:
+            continue
+        closed.add(u)
+        if u == t:
+            path = [t]
+            while preds[path[-1]] is not None:
+                path.append(preds[path[-1]])
+            path.reverse()
+            return -neg_cost, path
+        cost = -neg_cost
+        for e in graph.get_edges(u):
+            if e in blocked_edges:
+                continue
+            x = e.opposite(u)
+            if x in closed or x in blocked_vertices or x not in dist:
+                continue
+            new_cost = cost + weight(e)
+            if new_cost < best.get(x, INF):
+                best[x] = new_cost
+                preds[x] = u
+                tie += 1
+                heappush(heap, (new_cost + dist[x], -new_cost, tie, x))
+    return None
+
+
+def _tree_path(graph, s, t, tree, blocked_vertices, blocked_edges):
+    """ Return the path from s to t along the tree to t, or None if it is blocked. """
+    path = [s]
+    u = s
+    while u != t:
+        x = tree[u][1]
+        if x in blocked_vertices or graph.get_edge(u, x) in blocked_edges:
+            return None
+        path.append(x)
+        u = x
+    return path
+
+
+def _path_cost(graph, path, weight):
+    return sum(weight(graph.get_edge(path[i], path[i + 1]))
+               for i in range(len(path) - 1))
+
+
+def k_shortest_paths(graph, v, w, k=3, weight=None, tree=None):
+    """ Return up to k shortest loopless paths from v to w, cheapest first.
+
+    Yen's algorithm. Each new path is searched for by deviating from the
+    previous one at every vertex along it (the spur), with the edges used by
+    earlier paths that share the same start blocked. The tree of shortest
+    paths to w is reused for every spur: if the tree's own path from the
+    spur is not blocked it is taken as is, and otherwise an A* search
+    guided by the tree's exact costs finds the spur path.
+
+    Returns a list of (cost, path) pairs, each path a list of vertices from
+    v to w as returned by RouteMap.sp.
+
+    Args:
+        graph - a Graph or RouteMap object
+        v - the source vertex
+        w - the target vertex
+        k - the number of paths wanted
+        weight - optional function giving the cost of an edge; defaults to
+            the edge element
+        tree - optional graph.dijkstra(w) result under the same weights
+    """
+    if weight is None:
+        weight = Edge.element
+    if tree is None:
+        tree = graph.dijkstra(w, weight=weight)
+    if v not in tree or k <= 0:
+        return []
+    dist = {u: entry[0] for u, entry in tree.items()}
+    first = _tree_path(graph, v, w, tree, (), ())
+    found = [(_path_cost(graph, first, weight), first)]
+    seen = {tuple(first)}
+    candidates = []  # heap of (cost, tie, path)
+    tie = 0
+    while len(found) < k:
+        prev = found[-1][1]
+        for i in range(len(prev) - 1):
+            spur = prev[i]
+            root = prev[:i + 1]
+            blocked_edges = set()
+            for _, path in found:
+                if len(path) > i + 1 and path[:i + 1] == root:
+                    blocked_edges.add(graph.get_edge(path[i], path[i + 1]))
+            blocked_vertices = set(root[:-1])
+            spur_path = _tree_path(graph, spur, w, tree, blocked_vertices, blocked_edges)
+            if spur_path is None:
+                result = _search(graph, spur, w, dist, weight,
+                                 blocked_vertices, blocked_edges)
+                if result is None:
+                    continue
+                spur_path = result[1]
+            path = root[:-1] + spur_path
+            key = tuple(path)
+            if key not in seen:
+                seen.add(key)
+                tie += 1
+                heappush(candidates, (_path_cost(graph, path, weight), tie, path))
+        if not candidates:
+            break
+        cost, _, path = heappop(candidates)
+        found.append((cost, path))
+    return found
+
+
+def penalty_paths(graph, v, w, k=3, penalty=1.5, max_overlap=0.8, weight=None,
+                  tree=None, rounds=None):
+    """ Return up to k alternative paths from v to w by the penalty method.
+
+    After each search, the edges of the path found are made penalty times
+    dearer, so the next search is pushed onto other roads. A path is kept
+    if it is new and shares at most max_overlap of its cost with each path
+    kept before it, which gives more distinct alternatives than Yen's
+    algorithm at the cost of exactness: only the first path is guaranteed
+    shortest. The searches are A* searches guided by the tree of costs to
+    w, which penalties never make inadmissible.
+
+    Returns a list of (cost, path) pairs under the unpenalised weights,
+    cheapest first.
+
+    Args:
+        graph - a Graph or RouteMap object
+        v - the source vertex
+        w - the target vertex
+        k - the number of paths wanted
+        penalty - the factor applied to a path's edges after each search
+        max_overlap - the largest shared fraction of cost allowed
+        weight - optional function giving the cost of an edge; defaults to
+            the edge element
+        tree - optional graph.dijkstra(w) result under the same weights
+        rounds - the most searches to run; defaults to 4 * k
+    """
+    if weight is None:
+        weight = Edge.element
+    if tree is None:
+        tree = graph.dijkstra(w, weight=weight)
+    if v not in tree or k <= 0:
+        return []
+    dist = {u: entry[0] for u, entry in tree.items()}
+    factors = dict()  # edge -> penalty factor so far
+    penalised = lambda e: weight(e) * factors.get(e, 1.0)
+    found = []  # (cost, path, edge set)
+    seen = set()
+    for _ in range(rounds or 4 * k):
+        result = _search(graph, v, w, dist, penalised)
+        if result is None:
+            break
+        path = result[1]
+        edges = [graph.get_edge(path[i], path[i + 1]) for i in range(len(path) - 1)]
+        cost = sum(weight(e) for e in edges)
+        key = tuple(path)
+        if key not in seen:
+            seen.add(key)
+            edge_set = set(edges)
+            if cost == 0 or all(sum(weight(e) for e in edge_set & other) <= max_overlap * cost
+                                for _, _, other in found):
+                found.append((cost, path, edge_set))
+                if len(found) == k:
+                    break
+        for e in edges:
+            factors[e] = factors.get(e, 1.0) * penalty
+    found.sort(key=lambda entry: entry[0])
+    return [(cost, path) for cost, path, _ in found]
@@ -0,0 +1,145 @@
+from array import array
+import pickle
+
+INF = float('inf')
+
+
+class Landmarks:
+    """ Landmark distance tables for ALT (A*, landmarks, triangle inequality).
+
+        For a landmark L and vertices v and w, the triangle inequality gives
+        cost(v, w) >= |cost(L, w) - cost(L, v)| on an undirected graph. Taking
+        the largest such bound over a handful of well-spread landmarks gives
+        a lower bound that is usually much tighter than a great-circle one,
+        and it can be handed to RouteMap.astar as its heuristic.
+
+        Each landmark's table is one array of floats indexed by vertex
+        position in graph.vertices(), with infinity for unreachable vertices.
+    """
+
+    VERSION = 1
+
+    def __init__(self, graph):
+        """ Create an empty set of landmarks for graph; call build() or load() next.
+
+        Args:
+            graph - a Graph or RouteMap object
+        """
+        self._graph = graph
+        self._vertices = graph.vertices()
+        self._index = {v: i for i, v in enumerate(self._vertices)}
+        self._landmarks = []
+        self._tables = []
+
+    def build(self, k=8, start=None):
+        """ Pick k landmarks by weighted farthest-point selection.
+
+        The first landmark is the vertex furthest from start; each later one
+        is the vertex whose nearest landmark is furthest away. One dijkstra
+        per landmark fills its distance table.
+
+        Args:
+            k - the number of landmarks
+            start - the vertex to begin from; defaults to the first vertex
+        """
+        if not self._vertices:
+            return self
+        if start is None:
+            start = self._vertices[0]
+        first, _ = self._graph.furthest_v_weighted(start)
+        if first is None:
+            first = start
+        n = len(self._vertices)
+        nearest = array('d', [INF] * n)  # cost to the closest landmark so far
+        landmark = first
+        while landmark is not None and len(self._landmarks) < k:
+            table = self._table(landmark)
+            self._landmarks.append(landmark)
+            self._tables.append(table)
+            landmark, dist = None, -1
+            for i in range(n):
+                if table[i] < nearest[i]:
+                    nearest[i] = table[i]
+                # vertices no landmark reaches are left for other components
+                if dist < nearest[i] < INF:
+                    landmark, dist = self._vertices[i], nearest[i]
+            if dist <= 0:
+                landmark = None
+        return self
+
+    def _table(self, landmark):
+        """ Return the array of path costs from landmark to every vertex. """
+        table = array('d', [INF] * len(self._vertices))
+        index = self._index
+        for v, (cost, pred) in self._graph.dijkstra(landmark).items():
+            table[index[v]] = cost
+        return table
+
+    def landmarks(self):
+        """ Return the list of landmark vertices. """
+        return list(self._landmarks)
+
+    def bound(self, v, w):
+        """ Return a lower bound on the path cost between v and w. """
+        return self.heuristic(w)(v)
+
+    def heuristic(self, w):
+        """ Return a function of a vertex giving a lower bound on its cost to w.
+
+        The function is a consistent heuristic for RouteMap.astar(v, w).
+        """
+        index = self._index
+        wi = index[w]
+        pairs = [(table, table[wi]) for table in self._tables if table[wi] < INF]
+
+        def h(v):
+            vi = index[v]
+            best = 0
+            for table, to_w in pairs:
+                diff = table[vi] - to_w
+                if diff < 0:
+                    diff = -diff
+                if best < diff < INF:
+                    best = diff
+            return best
+        return h
+
+    def search(self, v, w):
+        """ Return RouteMap.astar(v, w) guided by the landmark bounds. """
+        return self._graph.astar(v, w, self.heuristic(w))
+
+    def save(self, filename):
+        """ Write the landmark tables to filename, keyed by vertex label. """
+        data = {'version': self.VERSION,
+                'labels': [v.element() for v in self._vertices],
+                'landmarks': [self._index[v] for v in self._landmarks],
+                'tables': self._tables}
+        with open(filename, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename, graph):
+        """ Return the landmarks saved in filename, attached to graph.
+
+        Vertices are matched to graph by label, so graph should be the same
+        map the tables were built from.
+
+        Args:
+            filename - a file written by save()
+            graph - a Graph or RouteMap object
+        """
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') != cls.VERSION:
+            raise ValueError('Unsupported landmark table version: '
+                             + str(data.get('version')))
+        lm = cls.__new__(cls)
+        by_label = dict()
+        for v in graph.vertices():
+            by_label.setdefault(v.element(), v)
+        lm._graph = graph
+        lm._vertices = [by_label[label] for label in data['labels']]
+        lm._index = {v: i for i, v in enumerate(lm._vertices)}
+        lm._landmarks = [lm._vertices[i] for i in data['landmarks']]
+        lm._tables = data['tables']
+        return lm
@@ -0,0 +1,163 @@
+import argparse
+import random
+from math import cos, radians, sqrt
+
+from Geo import *
+
+ORIGIN = (51.8985, -8.4756)  # Cork city centre
+
+SPEEDS = (8.3, 13.9, 22.2)  # metres per second: 30, 50 and 80 km/h
+
+# Generators return (nodes, edges) in the map file's terms:
+#   nodes - a list of (id, lat, long)
+#   edges - a list of (source id, target id, length in metres,
+#           time in seconds, one-way flag)
+
+
+def _offset(lat, long, north, east):
+    """ Return the position north and east metres from (lat, long). """
+    ky = radians(1) * EARTH_RADIUS
+    return lat + north / ky, long + east / (ky * cos(radians(lat)))
+
+
+def _edge(nodes, a, b, speed, oneway=False):
+    """ Return an edge record between node ids a and b (1-based). """
+    _, lat1, long1 = nodes[a - 1]
+    _, lat2, long2 = nodes[b - 1]
+    length = max(haversine(lat1, long1, lat2, long2), 1.0)
+    return a, b, length, length / speed, oneway
+
+
+def grid_map(rows, cols, spacing=100.0, speed=SPEEDS[1], origin=ORIGIN):
+    """ Return a rows x cols grid of streets spacing metres apart. """
+    nodes = []
+    for r in range(rows):
+        for c in range(cols):
+            lat, long = _offset(origin[0], origin[1], r * spacing, c * spacing)
+            nodes.append((len(nodes) + 1, lat, long))
+    edges = []
+    for r in range(rows):
+        for c in range(cols):
+            a = r * cols + c + 1
+            if c + 1 < cols:
+                edges.append(_edge(nodes, a, a + 1, speed))
+            if r + 1 < rows:
+                edges.append(_edge(nodes, a, a + cols, speed))
+    return nodes, edges
+
+
+def geometric_map(n, degree=6.0, seed=0, origin=ORIGIN):
+    """ Return n random points in a square, joined when they are close.
+
+    Points lie in a square with one point per hectare on average, and any
+    two are joined if they are within the radius that gives the requested
+    average degree. Road speeds are drawn from SPEEDS.
+    """
+    rnd = random.Random(seed)
+    side = sqrt(n) * 100.0
+    radius = sqrt(degree / 3.141592653589793) * 100.0
+    points = [(rnd.uniform(0, side), rnd.uniform(0, side)) for _ in range(n)]
+    nodes = []
+    for y, x in points:
+        lat, long = _offset(origin[0], origin[1], y, x)
+        nodes.append((len(nodes) + 1, lat, long))
+    cells = dict()
+    for i, (y, x) in enumerate(points):
+        cells.setdefault((int(y // radius), int(x // radius)), []).append(i)
+    edges = []
+    for i, (y, x) in enumerate(points):
+        cy, cx = int(y // radius), int(x // radius)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                for j in cells.get((cy + dy, cx + dx), ()):
+                    if j > i:
+                        y2, x2 = points[j]
+                        if (y - y2) ** 2 + (x - x2) ** 2 <= radius ** 2:
+                            edges.append(_edge(nodes, i + 1, j + 1, rnd.choice(SPEEDS)))
+    return nodes, edges
+
+
+def city_map(blocks, segments=4, block=300.0, drop=0.15, oneway=0.1,
+             arterial=5, seed=0, origin=ORIGIN):
+    """ Return a road-like map of blocks x blocks junctions.
+
+    Streets between neighbouring junctions are curved into segments
+    pieces, so most vertices have degree two as in real road data. A
+    fraction drop of the streets is missing, a fraction oneway of them is
+    one-way, and every arterial-th row and column is a fast road.
+    """
+    rnd = random.Random(seed)
+    nodes = []
+
+    def node(north, east):
+        lat, long = _offset(origin[0], origin[1], north, east)
+        nodes.append((len(nodes) + 1, lat, long))
+        return len(nodes)
+
+    junctions = dict()
+    for r in range(blocks):
+        for c in range(blocks):
+            junctions[r, c] = node(r * block, c * block)
+    edges = []
+    jitter = block / segments / 5
+    for r in range(blocks):
+        for c in range(blocks):
+            for dr, dc in ((0, 1), (1, 0)):
+                if r + dr >= blocks or c + dc >= blocks or rnd.random() < drop:
+                    continue
+                fast = (r % arterial == 0) if dc else (c % arterial == 0)
+                speed = SPEEDS[2] if fast else rnd.choice(SPEEDS[:2])
+                one = not fast and rnd.random() < oneway
+                prev = junctions[r, c]
+                for k in range(1, segments):
+                    north = (r + dr * k / segments) * block + rnd.uniform(-jitter, jitter)
+                    east = (c + dc * k / segments) * block + rnd.uniform(-jitter, jitter)
+                    x = node(north, east)
+                    edges.append(_edge(nodes, prev, x, speed, one))
+                    prev = x
+                edges.append(_edge(nodes, prev, junctions[r + dr, c + dc], speed, one))
+    return nodes, edges
+
+
+GENERATORS = {'grid': lambda size, seed: grid_map(size, size),
+              'geometric': lambda size, seed: geometric_map(size, seed=seed),
+              'city': lambda size, seed: city_map(size, seed=seed)}
+
+
+def write_map(filename, nodes, edges):
+    """ Write nodes and edges to filename in the Node/Edge map format. """
+    with open(filename, 'w') as f:
+        for nodeid, lat, long in nodes:
+            f.write('Node\nid: %d\ngps: %.7f %.7f\n' % (nodeid, lat, long))
+        for source, target, length, time, oneway in edges:
+            f.write('Edge\nsource: %d\ntarget: %d\nlength: %.2f\ntime: %.3f\noneway: %d\n'
+                    % (source, target, length, time, oneway))
+
+
+def generate(kind, size, filename, seed=0):
+    """ Write a generated map to filename and return its node and edge counts.
+
+    Args:
+        kind - one of the names in GENERATORS
+        size - the side of a grid or city in junctions, or the number of
+            points of a geometric map
+        filename - the map file to write
+        seed - the random seed
+    """
+    if kind not in GENERATORS:
+        raise ValueError('Unknown map kind: ' + kind
+                         + ' (expected one of ' + ', '.join(GENERATORS) + ')')
+    nodes, edges = GENERATORS[kind](size, seed)
+    write_map(filename, nodes, edges)
+    return len(nodes), len(edges)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic road map.')
+    parser.add_argument('kind', choices=sorted(GENERATORS))
+    parser.add_argument('size', type=int)
+    parser.add_argument('filename')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    nodes, edges = generate(args.kind, args.size, args.filename, args.seed)
+    print('Wrote', nodes, 'nodes and', edges, 'edges to', args.filename)
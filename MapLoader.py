@@ -0,0 +1,107 @@
+from RouteMap import *
+
+CHUNK_SIZE = 1 << 20  # characters read per call
+
+_TRUE = {'1', 'y', 'yes', 't', 'true'}
+
+
+def read_map(filename, graph, chunk_size=CHUNK_SIZE):
+    """ Add the Node and Edge records in filename to graph, in one pass.
+
+    The file is read in large chunks and split into lines, so there is no
+    per-line file call. A Node record is three lines ('Node', id, gps) and
+    an Edge record is six ('Edge', source, target, length, time, one-way),
+    each value being the second token of its line. Reading stops at the
+    first line that does not start a record, like the original readers.
+
+    Edge endpoints are resolved through graph.get_vertex_by_label, which is
+    a dict lookup. A RouteMap gets coordinates and edges weighted by time,
+    with the length and one-way flag passed to RouteMap.add_edge; a plain
+    Graph gets edges weighted by length.
+
+    Returns the number of nodes and edges read.
+
+    Args:
+        filename - the map file
+        graph - an empty Graph or RouteMap to fill in
+        chunk_size - the number of characters to read at a time
+    """
+    routes = isinstance(graph, RouteMap)
+    add_vertex = graph.add_vertex
+    add_edge = graph.add_edge
+    label = graph.get_vertex_by_label
+    nodes = edges = 0
+    pending = []  # lines of a record cut off by the end of a chunk
+    tail = ''  # a line cut off by the end of a chunk
+    done = False
+    with open(filename, 'r') as file:
+        while not done:
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            lines = (tail + chunk).split('\n')
+            tail = '' if eof else lines.pop()
+            if pending:
+                lines = pending + lines
+            n = len(lines)
+            i = 0
+            while i < n:
+                entry = lines[i].strip()
+                if entry == 'Node':
+                    if i + 2 >= n:
+                        break
+                    nodeid = int(lines[i + 1].split()[1])
+                    if routes:
+                        gps = lines[i + 2].split()
+                        add_vertex(nodeid, float(gps[1]), float(gps[2]))
+                    else:
+                        add_vertex(nodeid)
+                    nodes += 1
+                    i += 3
+                elif entry == 'Edge':
+                    if i + 5 >= n:
+                        break
+                    sv = label(int(lines[i + 1].split()[1]))
+                    tv = label(int(lines[i + 2].split()[1]))
+                    length = float(lines[i + 3].split()[1])
+                    if routes:
+                        time = float(lines[i + 4].split()[1])
+                        oneway = lines[i + 5].split()[1].lower() in _TRUE
+                        add_edge(sv, tv, time, length, oneway)
+                    else:
+                        add_edge(sv, tv, length)
+                    edges += 1
+                    i += 6
+                elif entry == '':
+                    i += 1
+                else:
+                    done = True
+                    break
+            pending = lines[i:] if not done else []
+            if eof:
+                if any(line.strip() for line in pending):
+                    raise ValueError('Incomplete record at the end of ' + filename)
+                done = True
+    return nodes, edges
+
+
+def load_routemap(filename, chunk_size=CHUNK_SIZE, components=False):
+    """ Read and return the RouteMap in filename, with its node and edge counts.
+
+    With components set, the component index is built once the map is
+    read, so routes between disconnected vertices are rejected without a
+    search. See Graph.component_index.
+    """
+    graph = RouteMap()
+    nodes, edges = read_map(filename, graph, chunk_size)
+    if components:
+        graph.component_index()
+    return graph, nodes, edges
+
+
+def load_graph(filename, chunk_size=CHUNK_SIZE, components=False):
+    """ Read and return the length-weighted Graph in filename, with its counts. """
+    graph = Graph()
+    nodes, edges = read_map(filename, graph, chunk_size)
+    if components:
+        graph.component_index()
+    return graph, nodes, edges
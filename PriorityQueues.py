@@ -0,0 +1,313 @@
+from heapq import heappush, heappop
+import random
+import time
+
+from AdaptablePriorityQueue import *
+
+# All queues share the AdaptablePriorityQueue interface used by dijkstra:
+#   add(key, item) -> locator, get_key(locator), update_key(locator, key),
+#   min() -> locator, remove_min() -> (item, key), empty()
+
+
+class IndexedHeap:
+    """ An array-backed indexed d-ary min-heap.
+
+        Entries live in parallel key/value/position lists indexed by a slot
+        number, which is the locator returned by add. The heap itself is a
+        list of slots, and sifting is iterative, so no per-entry objects are
+        allocated and keys are compared directly.
+    """
+
+    def __init__(self, d=4):
+        """ Create an empty heap where each node has up to d children. """
+        self._d = d
+        self._heap = []  # heap position -> slot
+        self._keys = []  # slot -> key
+        self._values = []  # slot -> item
+        self._pos = []  # slot -> heap position, or -1 once removed
+
+    def empty(self):
+        return len(self._heap) == 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, key, item):
+        slot = len(self._keys)
+        self._keys.append(key)
+        self._values.append(item)
+        self._pos.append(len(self._heap))
+        self._heap.append(slot)
+        self._sift_up(len(self._heap) - 1)
+        return slot
+
+    def get_key(self, slot):
+        if slot is None:
+            return None
+        return self._keys[slot]
+
+    def min(self):
+        return self._heap[0]
+
+    def update_key(self, slot, newkey):
+        old = self._keys[slot]
+        self._keys[slot] = newkey
+        if newkey < old:
+            self._sift_up(self._pos[slot])
+        else:
+            self._sift_down(self._pos[slot])
+
+    def remove_min(self):
+        heap = self._heap
+        if not heap:
+            return None
+        top = heap[0]
+        last = heap.pop()
+        if heap:
+            heap[0] = last
+            self._pos[last] = 0
+            self._sift_down(0)
+        self._pos[top] = -1
+        return self._values[top], self._keys[top]
+
+    def _sift_up(self, i):
+        heap, keys, pos, d = self._heap, self._keys, self._pos, self._d
+        slot = heap[i]
+        key = keys[slot]
+        while i > 0:
+            parent = (i - 1) // d
+            p_slot = heap[parent]
+            if keys[p_slot] <= key:
+                break
+            heap[i] = p_slot
+            pos[p_slot] = i
+            i = parent
+        heap[i] = slot
+        pos[slot] = i
+
+    def _sift_down(self, i):
+        heap, keys, pos, d = self._heap, self._keys, self._pos, self._d
+        n = len(heap)
+        slot = heap[i]
+        key = keys[slot]
+        while True:
+            first = i * d + 1
+            if first >= n:
+                break
+            best = first
+            best_key = keys[heap[first]]
+            for c in range(first + 1, min(first + d, n)):
+                c_key = keys[heap[c]]
+                if c_key < best_key:
+                    best, best_key = c, c_key
+            if best_key >= key:
+                break
+            heap[i] = heap[best]
+            pos[heap[i]] = i
+            i = best
+        heap[i] = slot
+        pos[slot] = i
+
+
+class LazyHeap:
+    """ A binary heap on heapq where decrease-key pushes a fresh entry.
+
+        The locator is a small list [key, item, live]. Superseded heap
+        entries are skipped when they reach the top, so a decrease-key is a
+        single push at the cost of some extra heap entries.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._count = 0  # tie-breaker, so items are never compared
+        self._size = 0
+
+    def empty(self):
+        return self._size == 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key, item):
+        loc = [key, item, True]
+        self._count += 1
+        heappush(self._heap, (key, self._count, loc))
+        self._size += 1
+        return loc
+
+    def get_key(self, loc):
+        if loc is None:
+            return None
+        return loc[0]
+
+    def update_key(self, loc, newkey):
+        loc[0] = newkey
+        self._count += 1
+        heappush(self._heap, (newkey, self._count, loc))
+
+    def _prune(self):
+        heap = self._heap
+        while heap and (not heap[0][2][2] or heap[0][0] != heap[0][2][0]):
+            heappop(heap)
+
+    def min(self):
+        self._prune()
+        return self._heap[0][2]
+
+    def remove_min(self):
+        self._prune()
+        if not self._heap:
+            return None
+        key, _, loc = heappop(self._heap)
+        loc[2] = False
+        self._size -= 1
+        return loc[1], key
+
+
+class RadixHeap:
+    """ A monotone radix heap for non-negative keys scaled to integers.
+
+        Keys are multiplied by scale and rounded, and each entry is kept in
+        the bucket given by the highest bit in which its integer key differs
+        from the last key removed. Keys may never drop below the last key
+        removed, which holds for dijkstra with non-negative weights. The
+        order is exact when all weights are multiples of 1/scale, and
+        otherwise only ties closer than 1/scale may come out of order.
+
+        Decrease-key is lazy, as in LazyHeap: the locator is a list
+        [key, item, live, scaled key], bucket entries are (scaled key,
+        locator) pairs, and an entry is stale once its scaled key no longer
+        matches the locator's.
+    """
+
+    def __init__(self, scale=1000):
+        self._scale = scale
+        self._buckets = [[] for _ in range(65)]
+        self._last = 0
+        self._size = 0
+
+    def empty(self):
+        return self._size == 0
+
+    def __len__(self):
+        return self._size
+
+    def _insert(self, ikey, loc):
+        if ikey < self._last:
+            raise ValueError('RadixHeap keys must not drop below the last key removed')
+        self._buckets[(ikey ^ self._last).bit_length()].append((ikey, loc))
+
+    def add(self, key, item):
+        ikey = round(key * self._scale)
+        loc = [key, item, True, ikey]
+        self._insert(ikey, loc)
+        self._size += 1
+        return loc
+
+    def get_key(self, loc):
+        if loc is None:
+            return None
+        return loc[0]
+
+    def update_key(self, loc, newkey):
+        loc[0] = newkey
+        ikey = round(newkey * self._scale)
+        if ikey != loc[3]:
+            loc[3] = ikey
+            self._insert(ikey, loc)
+
+    def min(self):
+        buckets = self._buckets
+        bucket = buckets[0]
+        while True:
+            while bucket and not (bucket[-1][1][2] and bucket[-1][0] == bucket[-1][1][3]):
+                bucket.pop()
+            if bucket:
+                return bucket[-1][1]
+            # bucket 0 is empty: redistribute the first non-empty bucket
+            for i in range(1, 65):
+                live = [e for e in buckets[i] if e[1][2] and e[0] == e[1][3]]
+                buckets[i].clear()
+                if live:
+                    self._last = last = min(e[0] for e in live)
+                    for e in live:
+                        buckets[(e[0] ^ last).bit_length()].append(e)
+                    break
+            else:
+                return None
+
+    def remove_min(self):
+        if self._size == 0:
+            return None
+        loc = self.min()
+        self._buckets[0].pop()
+        loc[2] = False
+        self._size -= 1
+        return loc[1], loc[0]
+
+
+QUEUES = {'apq': AdaptablePriorityQueue,
+          'dary': IndexedHeap,
+          'heapq': LazyHeap,
+          'radix': RadixHeap}
+
+
+def make_queue(queue=None):
+    """ Return a new, empty priority queue.
+
+    Args:
+        queue - None for an AdaptablePriorityQueue, one of the names in
+            QUEUES, or a class or function returning a queue
+    """
+    if queue is None:
+        return AdaptablePriorityQueue()
+    if isinstance(queue, str):
+        if queue not in QUEUES:
+            raise ValueError('Unknown priority queue: ' + queue
+                             + ' (expected one of ' + ', '.join(QUEUES) + ')')
+        return QUEUES[queue]()
+    return queue()
+
+
+def benchmark(n=100000, decreases=None, seed=0, queues=None):
+    """ Time add, decrease-key and remove_min for each queue strategy.
+
+    Adds n random keys, lowers random keys decreases times (default n),
+    then empties the queue. Returns a dict of queue name -> seconds per
+    operation for each phase.
+
+    Args:
+        n - the number of items
+        decreases - the number of decrease-key calls
+        seed - the random seed
+        queues - names from QUEUES to time; defaults to all of them
+    """
+    rnd = random.Random(seed)
+    if decreases is None:
+        decreases = n
+    keys = [rnd.uniform(1000, 2000) for _ in range(n)]
+    updates = [(rnd.randrange(n), rnd.uniform(0, 1)) for _ in range(decreases)]
+    results = dict()
+    for name in queues or QUEUES:
+        pq = make_queue(name)
+        current = list(keys)
+        start = time.perf_counter()
+        locs = [pq.add(k, i) for i, k in enumerate(keys)]
+        added = time.perf_counter()
+        for i, factor in updates:
+            current[i] *= factor
+            pq.update_key(locs[i], current[i])
+        decreased = time.perf_counter()
+        while not pq.empty():
+            pq.remove_min()
+        removed = time.perf_counter()
+        results[name] = {'add': (added - start) / n,
+                         'decrease_key': (decreased - added) / max(decreases, 1),
+                         'remove_min': (removed - decreased) / n}
+    return results
+
+
+if __name__ == '__main__':
+    for name, phases in benchmark().items():
+        print(name + '\t' + '\t'.join(phase + ' ' + format(secs * 1e6, '.2f') + 'us'
+                                      for phase, secs in phases.items()))
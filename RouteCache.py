@@ -0,0 +1,110 @@
+from collections import OrderedDict
+import sys
+
+
+class RouteCache:
+    """ Least-recently-used caches of shortest-path trees and finished routes.
+
+        Trees are dijkstra results keyed by (source, metric) and bounded both
+        by count and by an estimate of their size in bytes. Routes are the
+        vertex lists returned by RouteMap.sp, keyed by (source, target,
+        metric), each kept with the costs of its own vertices so that it can
+        be printed again without its tree. Hits and misses are counted for
+        both.
+    """
+
+    ENTRY_BYTES = 80  # a (cost, preceding vertex) tuple and its float
+
+    def __init__(self, max_trees=32, max_bytes=64 << 20, max_routes=1024):
+        """ Create an empty cache.
+
+        Args:
+            max_trees - the most trees to keep
+            max_bytes - the most estimated bytes of trees to keep, or None
+            max_routes - the most routes to keep
+        """
+        self.max_trees = max_trees
+        self.max_bytes = max_bytes
+        self.max_routes = max_routes
+        self._trees = OrderedDict()  # key -> (tree, bytes, keeper)
+        self._routes = OrderedDict()  # key -> (path, costs)
+        self._bytes = 0
+        self.tree_hits = self.tree_misses = 0
+        self.route_hits = self.route_misses = 0
+
+    @classmethod
+    def tree_size(cls, tree):
+        """ Return the estimated number of bytes held by a dijkstra result. """
+        return sys.getsizeof(tree) + len(tree) * cls.ENTRY_BYTES
+
+    def get_tree(self, source, metric=None):
+        """ Return the cached tree for source and metric, or None. """
+        key = (source, metric)
+        entry = self._trees.get(key)
+        if entry is None:
+            self.tree_misses += 1
+            return None
+        self.tree_hits += 1
+        self._trees.move_to_end(key)
+        return entry[0]
+
+    def put_tree(self, source, tree, metric=None, keeper=None):
+        """ Cache a full dijkstra tree from source, evicting old trees as needed.
+
+        Args:
+            source - the source vertex
+            tree - the dijkstra result
+            metric - the edge metric it was computed with
+            keeper - an optional object to hold on to for as long as the
+                tree is cached, such as a DynamicShortestPathTree
+        """
+        key = (source, metric)
+        size = self.tree_size(tree)
+        if key in self._trees:
+            self._bytes -= self._trees.pop(key)[1]
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self._trees[key] = (tree, size, keeper)
+        self._bytes += size
+        while (len(self._trees) > self.max_trees
+               or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            self._bytes -= self._trees.popitem(last=False)[1][1]
+
+    def get_route(self, source, target, metric=None):
+        """ Return the cached (path, costs) from source to target, or None. """
+        key = (source, target, metric)
+        entry = self._routes.get(key)
+        if entry is None:
+            self.route_misses += 1
+            return None
+        self.route_hits += 1
+        self._routes.move_to_end(key)
+        return entry
+
+    def put_route(self, source, target, path, costs, metric=None):
+        """ Cache a route as its vertex list and a dict of its vertex costs. """
+        key = (source, target, metric)
+        self._routes[key] = (path, costs)
+        self._routes.move_to_end(key)
+        while len(self._routes) > self.max_routes:
+            self._routes.popitem(last=False)
+
+    def clear_routes(self):
+        """ Drop every cached route, keeping the trees. """
+        self._routes.clear()
+
+    def clear(self):
+        """ Drop every cached tree and route, keeping the statistics. """
+        self._trees.clear()
+        self._routes.clear()
+        self._bytes = 0
+
+    def stats(self):
+        """ Return a dict of hit and miss counts and current sizes. """
+        return {'tree_hits': self.tree_hits,
+                'tree_misses': self.tree_misses,
+                'route_hits': self.route_hits,
+                'route_misses': self.route_misses,
+                'trees': len(self._trees),
+                'tree_bytes': self._bytes,
+                'routes': len(self._routes)}
@@ -0,0 +1,169 @@
+import json
+import sys
+from xml.sax.saxutils import escape
+
+BUFFER_SIZE = 1 << 16  # characters gathered before each write
+
+# A route is streamed as points: (lat, long, element, cost) tuples, made by
+# route_points from a shortest-path dict and a path, or by tree_points for
+# every vertex of a shortest-path tree. The *_lines generators turn points
+# into text a piece at a time, and write_lines sends any of them to a file
+# through one buffer.
+
+
+def _element(graph, v):
+    """ Return the element of v, a Vertex or a FrozenGraph vertex id. """
+    return v.element() if hasattr(v, 'element') else graph.element(v)
+
+
+def route_points(graph, d, path):
+    """ Yield (lat, long, element, cost) for each vertex of path.
+
+    Args:
+        graph - a RouteMap or a FrozenGraph with coordinates
+        d - a dict of vertex -> (cost, preceding vertex), as from dijkstra
+        path - the vertices of the route, in order
+    """
+    for v in path:
+        lat, long = graph.coordinates(v)
+        yield lat, long, _element(graph, v), d[v][0]
+
+
+def tree_points(graph, d):
+    """ Yield (lat, long, element, cost) for every vertex in d. """
+    return route_points(graph, d, d.keys())
+
+
+def tsv_lines(points):
+    """ Yield the tab-separated lines RouteMap.sp prints, for GPS Visualizer. """
+    yield 'type\tlatitude\tlongitude\telement\tcost\n'
+    for lat, long, element, cost in points:
+        yield ('W\t' + str(lat) + '\t' + str(long) + '\t' + str(element)
+               + '\t' + str(cost) + '\n')
+
+
+def tree_lines(d, name=str):
+    """ Yield the lines Graph.print_paths prints for a shortest-path dict.
+
+    Args:
+        d - a dict of vertex -> (cost, preceding vertex)
+        name - function giving the text for a vertex or None
+    """
+    for v, (cost, pred) in d.items():
+        yield ('Vertex: ' + name(v) + '; Cost: ' + str(cost)
+               + '; Preceding Vertex: ' + name(pred) + '\n')
+
+
+def gpx_lines(points, name=None):
+    """ Yield a GPX 1.1 document with the points as one track. """
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield ('<gpx version="1.1" creator="RouteMap" '
+           'xmlns="http://www.topografix.com/GPX/1/1">\n')
+    yield '<trk>\n'
+    if name is not None:
+        yield '<name>' + escape(str(name)) + '</name>\n'
+    yield '<trkseg>\n'
+    for lat, long, element, cost in points:
+        yield ('<trkpt lat="' + repr(float(lat)) + '" lon="' + repr(float(long))
+               + '"><name>' + escape(str(element)) + '</name><desc>'
+               + repr(float(cost)) + '</desc></trkpt>\n')
+    yield '</trkseg>\n</trk>\n</gpx>\n'
+
+
+def geojson_lines(points, line=True):
+    """ Yield a GeoJSON FeatureCollection of the points, one feature per line.
+
+    Each point becomes a Point feature with its element and cost. With line
+    set, a final LineString feature joins them, if there are two or more;
+    only its coordinates are kept while streaming. A one-vertex route is
+    just its Point, as a LineString needs at least two positions.
+    """
+    coords = [] if line else None
+    yield '{"type": "FeatureCollection", "features": [\n'
+    first = True
+    for lat, long, element, cost in points:
+        if coords is not None:
+            coords.append([long, lat])
+        feature = {'type': 'Feature',
+                   'geometry': {'type': 'Point', 'coordinates': [long, lat]},
+                   'properties': {'element': _json_safe(element), 'cost': cost}}
+        yield ('' if first else ',\n') + json.dumps(feature)
+        first = False
+    if coords is not None and len(coords) > 1:
+        feature = {'type': 'Feature',
+                   'geometry': {'type': 'LineString', 'coordinates': coords},
+                   'properties': {}}
+        yield ('' if first else ',\n') + json.dumps(feature)
+    yield '\n]}\n'
+
+
+def _json_safe(value):
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _encode_value(value):
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def polyline_lines(points, precision=5):
+    """ Yield a Google encoded polyline of the points, a point at a time. """
+    factor = 10 ** precision
+    last_lat = last_long = 0
+    for lat, long, _, _ in points:
+        lat, long = round(lat * factor), round(long * factor)
+        yield _encode_value(lat - last_lat) + _encode_value(long - last_long)
+        last_lat, last_long = lat, long
+    yield '\n'
+
+
+def encode_polyline(points, precision=5):
+    """ Return the Google encoded polyline of the points, as a string. """
+    return ''.join(polyline_lines(points, precision))[:-1]
+
+
+FORMATS = {'tsv': tsv_lines,
+           'gpx': gpx_lines,
+           'geojson': geojson_lines,
+           'polyline': polyline_lines}
+
+
+def write_lines(lines, file=None, buffer_size=BUFFER_SIZE):
+    """ Write an iterable of strings to file, gathering them into large writes.
+
+    Args:
+        lines - an iterable of strings, such as one of the *_lines generators
+        file - a text file object; defaults to sys.stdout at the time of the
+            call
+        buffer_size - the number of characters gathered before each write
+    """
+    if file is None:
+        file = sys.stdout
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            file.write(''.join(buffer))
+            buffer = []
+            size = 0
+    if buffer:
+        file.write(''.join(buffer))
+
+
+def export(points, file=None, format='tsv', buffer_size=BUFFER_SIZE):
+    """ Write points to file in format, one of the names in FORMATS. """
+    if format not in FORMATS:
+        raise ValueError('Unknown export format: ' + format
+                         + ' (expected one of ' + ', '.join(FORMATS) + ')')
+    write_lines(FORMATS[format](points), file, buffer_size)
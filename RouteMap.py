@@ -1,24 +1,97 @@
 from Graph import *
+from Geo import *
+from DistanceMatrix import *
+from RouteCache import *
+from SpatialIndex import *
+from DynamicShortestPathTree import *
+from KShortestPaths import *
+import os
+import sys
 
 
 class RouteMap(Graph):
     def __init__(self):
         super().__init__()
         self.coords = dict()
-        self.vertex_objects = dict()
+        self.vertex_objects = self._labels  # element -> vertex
+        self.lengths = dict()  # edge -> road length, where known
+        self.oneway = set()  # edges only travelled from start() to end()
+        self._max_speed = None  # cached by max_speed(), reset by add_edge
+        self._cache = None  # a RouteCache, once enable_cache() is called
+        self._spatial = None  # a SpatialIndex, built by spatial_index()
+        self._frozen = None  # (FrozenGraph, vertex -> id), for distance_matrix
 
     def add_vertex(self, element, lat, long):
         v = super().add_vertex(element)
         self.coords[v] = (lat, long)
-        self.vertex_objects[element] = v
+        self._frozen = None
+        if self._cache is not None:
+            self._cache.clear()
+        if self._spatial is not None:
+            self._spatial.insert(v, lat, long)
         return v
 
     def add_vertex_if_new(self, element, lat, long):
-        for v in self._structure:
-            if v.element() == element:
-                return v
+        v = self.get_vertex_by_label(element)
+        if v is not None:
+            return v
         return self.add_vertex(element, lat, long)
 
+    def add_edge(self, v, w, element, length=None, oneway=False):
+        """ Add and return an edge from v to w, as Graph.add_edge.
+
+        Args:
+            v - a vertex object
+            w - a vertex object
+            element - the travel cost, usually a time
+            length - optional road length, kept in self.lengths
+            oneway - if True, the road may only be travelled from v to w;
+                the edge is kept in self.oneway
+        """
+        added = self._insert_edge(v, w, element)
+        if added is None:
+            return None
+        e, old = added
+        self._max_speed = None
+        self._frozen = None
+        if self._cache is not None:
+            self._cache.clear()
+        if old is not None:
+            self.lengths.pop(old, None)
+            self.oneway.discard(old)
+        if length is not None:
+            self.lengths[e] = length
+        if oneway:
+            self.oneway.add(e)
+        # repair trees only now, so one weighted by lengths finds e's
+        self._edge_added(e, old)
+        return e
+
+    def remove_vertices(self, vertices):
+        """ Remove several vertices, their edges and coordinates, as Graph.remove_vertices. """
+        vertices = list(vertices)
+        removed = super().remove_vertices(vertices)
+        for e in removed:
+            self.lengths.pop(e, None)
+            self.oneway.discard(e)
+        for v in vertices:
+            self.coords.pop(v, None)
+            if self._spatial is not None:
+                self._spatial.remove(v)
+        self._max_speed = None
+        self._frozen = None
+        if self._cache is not None:
+            self._cache.clear()
+        return removed
+
+    def _weights_changed(self, changes):
+        """ Repair tracked trees, including cached ones, and drop cached routes. """
+        super()._weights_changed(changes)
+        self._max_speed = None
+        self._frozen = None
+        if self._cache is not None:
+            self._cache.clear_routes()
+
     def coordinates(self, v):
         if v in self.coords:
             return self.coords[v]
@@ -26,46 +99,378 @@ class RouteMap(Graph):
             print("ERROR: Vertex not in RouteMap")
             return None
 
+    def spatial_index(self):
+        """ Return the SpatialIndex of the vertex coordinates.
+
+        It is built on the first call and kept up to date by add_vertex.
+        """
+        if self._spatial is None:
+            self._spatial = SpatialIndex.from_coords(self.coords)
+        return self._spatial
+
+    def nearest_vertex(self, lat, long):
+        """ Return the vertex closest to (lat, long), or None if there are none. """
+        found = self.spatial_index().nearest(lat, long)
+        return None if found is None else found[0]
+
+    def nearest_vertices(self, lat, long, k):
+        """ Return up to k (vertex, metres) pairs closest to (lat, long). """
+        return self.spatial_index().k_nearest(lat, long, k)
+
+    def vertices_in_box(self, min_lat, min_long, max_lat, max_long):
+        """ Return the vertices inside the given latitude/longitude box. """
+        return self.spatial_index().within_box(min_lat, min_long, max_lat, max_long)
+
+    def memory_report(self):
+        """ Return a dict of the approximate bytes held by each structure.
+
+        Adds the coordinates, road lengths, one-way set and, once built,
+        the spatial index and distance_matrix's frozen copy to
+        Graph.memory_report.
+        """
+        report = super().memory_report()
+        for key in ('total', 'bytes_per_vertex', 'bytes_per_edge'):
+            del report[key]
+        coords = sys.getsizeof(self.coords)
+        for point in self.coords.values():
+            coords += (sys.getsizeof(point) + sys.getsizeof(point[0])
+                       + sys.getsizeof(point[1]))
+        report['coords'] = coords
+        lengths = sys.getsizeof(self.lengths)
+        for length in self.lengths.values():
+            lengths += sys.getsizeof(length)
+        report['lengths'] = lengths
+        report['oneway'] = sys.getsizeof(self.oneway)
+        if self._spatial is not None:
+            report['spatial_index'] = self._spatial.memory_usage()
+        if self._frozen is not None:
+            report['frozen'] = self._frozen[0].memory_usage()
+        return self._summarise(report)
+
+    def freeze(self):
+        """ Return an immutable compressed-sparse-row copy with coordinates. """
+        return FrozenGraph.from_graph(self, self.coords)
+
     def __str__(self):
         if self.num_vertices() < 100 and self.num_edges() < 100:
             return super().__str__()
         else:
             return 'Too many vertices/edges, not printing'
 
-    def get_vertex_by_label(self, element):
-        """ Return the first vertex that matches element. """
-        if element in self.vertex_objects:
-            return self.vertex_objects[element]
-        return None
+    def enable_cache(self, max_trees=32, max_bytes=64 << 20, max_routes=1024):
+        """ Start caching shortest-path trees and routes; see RouteCache.
+
+        The cache is cleared whenever add_vertex or add_edge changes the map.
+        """
+        self._cache = RouteCache(max_trees, max_bytes, max_routes)
+        return self._cache
+
+    def disable_cache(self):
+        """ Stop caching and drop anything cached. """
+        self._cache = None
+
+    def cache_stats(self):
+        """ Return the cache's hit and miss counts, or None if it is disabled. """
+        if self._cache is None:
+            return None
+        return self._cache.stats()
+
+    def metric_weight(self, metric=None):
+        """ Return the edge cost function for metric, for dijkstra.
+
+        Args:
+            metric - None or 'time' for the edge elements, or 'length' for
+                the road lengths in self.lengths
+        """
+        if metric is None or metric == 'time':
+            return None
+        if metric == 'length':
+            return self.lengths.__getitem__
+        raise ValueError('Unknown metric: ' + str(metric))
+
+    def shortest_path_tree(self, v, metric=None):
+        """ Return dijkstra(v) under metric, from the cache when possible. """
+        if self._cache is not None:
+            tree = self._cache.get_tree(v, metric)
+            if tree is not None:
+                return tree
+        tree = self.dijkstra(v, weight=self.metric_weight(metric))
+        if self._cache is not None:
+            keeper = None
+            if self.metric_weight(metric) is None:
+                # weight updates repair the cached tree rather than drop it
+                keeper = DynamicShortestPathTree(self, v, tree)
+            self._cache.put_tree(v, tree, metric, keeper)
+        return tree
+
+    def isochrones(self, v, budgets, boundary=False, metric=None):
+        """ Return what can be reached from v within each of several budgets.
+
+        One dijkstra pass, bounded by the largest budget, serves every
+        budget: vertices are settled in cost order, so each budget's region
+        is a prefix of the search. Returns a list with one dict per budget,
+        in the order given:
+            'budget' - the budget
+            'vertices' - dict of vertex -> (cost, preceding vertex), usable
+                with sp, for the vertices reachable within the budget
+            'coords' - list of the (lat, long) of those vertices, in order
+            'boundary' - with boundary=True, a list of (edge, (lat, long))
+                for each edge leaving the region, with the point along it
+                where the budget runs out; these outline the region
+
+        Args:
+            v - the source vertex
+            budgets - a list of costs, such as [300, 600, 900] seconds
+            boundary - if True, also find the boundary edges
+            metric - None or 'time' for travel times, or 'length' for metres
+        """
+        budgets = list(budgets)
+        if not budgets:
+            return []
+        weight = self.metric_weight(metric)
+        cost_of = Edge.element if weight is None else weight
+        closed = self.dijkstra(v, weight=weight, limit=max(budgets))
+        settled = list(closed.items())
+        results = dict()
+        for budget in set(budgets):
+            vertices = dict()
+            for u, entry in settled:
+                if entry[0] > budget:
+                    break
+                vertices[u] = entry
+            region = {'budget': budget, 'vertices': vertices,
+                      'coords': [self.coords[u] for u in vertices]}
+            if boundary:
+                region['boundary'] = self._isochrone_boundary(vertices, budget, cost_of)
+            results[budget] = region
+        return [results[budget] for budget in budgets]
+
+    def _isochrone_boundary(self, vertices, budget, cost_of):
+        """ Return (edge, cut point) for the edges leaving an isochrone region. """
+        edges = []
+        for u, (cost, _) in vertices.items():
+            for e in self.get_edges(u):
+                x = e.opposite(u)
+                if x in vertices:
+                    continue
+                length = cost_of(e)
+                fraction = (budget - cost) / length if length > 0 else 0.0
+                lat1, long1 = self.coords[u]
+                lat2, long2 = self.coords[x]
+                edges.append((e, (lat1 + (lat2 - lat1) * fraction,
+                                  long1 + (long2 - long1) * fraction)))
+        return edges
+
+    def _impossible(self, v, w):
+        """ Return True if the component index shows there is no route between v and w. """
+        return self._components is not None and not self._components.reachable(v, w)
 
     # Added in an extra argument 'dijkstra_dict' to prevent unnecessarily running dijkstra twice.
-    # If the dijsktra_dict is supplied, it won't run again, if it isn't supplied, it will run
-    def sp(self, v, w, dijsktra_dict=None):
+    # If the dijsktra_dict is supplied, it won't run again, if it isn't supplied, it will run.
+    # With the cache enabled, finished routes and whole trees are reused instead.
+    def sp(self, v, w, dijsktra_dict=None, metric=None):
+        if self._impossible(v, w):
+            print("ERROR: No route between the vertices")
+            return None
         paths = dijsktra_dict
+        if paths is None and self._cache is not None:
+            route = self._cache.get_route(v, w, metric)
+            if route is not None:
+                pathing, costs = route
+                self.print_paths_for_GPS(costs, pathing)
+                return list(pathing)
+            paths = self.shortest_path_tree(v, metric)
         if paths is None:
-            paths = self.dijkstra(v)
+            paths = self.dijkstra(v, w, weight=self.metric_weight(metric))
+        if w not in paths:
+            print("ERROR: No route between the vertices")
+            return None
         pathing = list()
-        found = False
         curr = w
-        while not found:
-            a = curr  # point A (starting point)
-            b = paths[a][1]  # point B ( preceding A )
-            curr = b
-            pathing.append(a)
-            if b == v:  # if point B is the starting point
-                pathing.append(b)
-                found = True
+        while curr != v:
+            pathing.append(curr)  # point A, then step back to the point preceding A
+            curr = paths[curr][1]
+        pathing.append(v)
         pathing.reverse()
+        if dijsktra_dict is None and self._cache is not None:
+            self._cache.put_route(v, w, tuple(pathing),
+                                  {u: paths[u] for u in pathing}, metric)
         self.print_paths_for_GPS(paths, pathing)
         return pathing
 
-    def print_paths_for_GPS(self, d, sp):
-        print("type\tlatitude\tlongitude\telement\tcost")
-        for i in sp:
-            coords = self.coordinates(i)
-            lat = str(coords[0])
-            long = str(coords[1])
-            el = str(i.element())
-            cost = str(d[i][0])
+    def alternative_routes(self, v, w, k=3, method='yen', metric=None, **options):
+        """ Return up to k routes from v to w as (cost, path) pairs, cheapest first.
+
+        Each path is a list of vertices as returned by sp. The tree of
+        shortest paths to w comes from shortest_path_tree, so it is cached
+        when the cache is enabled.
+
+        Args:
+            v - the source vertex
+            w - the target vertex
+            k - the number of routes wanted
+            method - 'yen' for the exact k shortest loopless paths, or
+                'penalty' for faster, more distinct alternatives; see
+                KShortestPaths
+            metric - None or 'time' for travel times, or 'length' for metres
+            options - passed on to KShortestPaths.penalty_paths
+        """
+        if self._impossible(v, w):
+            return []
+        weight = self.metric_weight(metric)
+        tree = self.shortest_path_tree(w, metric)
+        if method == 'yen':
+            return k_shortest_paths(self, v, w, k, weight, tree)
+        if method == 'penalty':
+            return penalty_paths(self, v, w, k, weight=weight, tree=tree, **options)
+        raise ValueError('Unknown method: ' + str(method) + " (expected 'yen' or 'penalty')")
+
+    def max_speed(self):
+        """ Return the highest great-circle distance per unit of edge weight.
+
+        For time-weighted edges this is the fastest speed on the map, in
+        metres per unit of time, so that dividing a great-circle distance by
+        it never overestimates the cost of a route. Returns 0 if there are
+        no weighted edges, and infinity if an edge of weight 0 joins two
+        different points.
+        """
+        if self._max_speed is None:
+            speed = 0
+            for e in self.edges():
+                v, w = e.vertices()
+                weight = e.element()
+                if weight is None:
+                    continue
+                dist = haversine(*self.coords[v], *self.coords[w])
+                if weight > 0:
+                    speed = max(speed, dist / weight)
+                elif dist > 0:
+                    speed = float('inf')
+            self._max_speed = speed
+        return self._max_speed
+
+    def _great_circle_bound(self, w):
+        """ Return a function giving a lower bound on the cost from a vertex to w. """
+        speed = self.max_speed()
+        if speed == 0 or speed == float('inf'):
+            return lambda v: 0
+        lat, long = self.coords[w]
+        coords = self.coords
+        return lambda v: haversine(coords[v][0], coords[v][1], lat, long) / speed
+
+    def astar(self, v, w, heuristic=None):
+        """ Return a dict of vertex -> (cost, preceding vertex) for an A* search.
+
+        Expands vertices in order of cost from v plus a lower bound on the
+        remaining cost to w, and stops when w is settled. The result has the
+        same shape as dijkstra(v, w) and can be passed to sp; its length is
+        the number of vertices expanded.
+
+        Args:
+            v - the source vertex
+            w - the target vertex
+            heuristic - optional function of a vertex giving a consistent
+                lower bound on its cost to w. Defaults to the great-circle
+                distance divided by max_speed().
+        """
+        if self._impossible(v, w):
+            return {v: (0, None)}
+        if heuristic is None:
+            heuristic = self._great_circle_bound(w)
+        APQ = AdaptablePriorityQueue()
+        locs = dict()
+        closed = dict()
+        preds = {v: None}
+        costs = {v: 0}
+        bounds = {v: heuristic(v)}
+        locs[v] = APQ.add(bounds[v], v)
+
+        while not APQ.empty():
+            u, u_key = APQ.remove_min()
+            locs.pop(u)
+            u_cost = costs.pop(u)
+            closed[u] = (u_cost, preds.pop(u))
+            if u == w:
+                break
+            for e in self.get_edges(u):
+                x = e.opposite(u)
+                if x not in closed:
+                    new_cost = u_cost + e.element()
+                    if x not in locs:
+                        if x not in bounds:
+                            bounds[x] = heuristic(x)
+                        preds[x] = u
+                        costs[x] = new_cost
+                        locs[x] = APQ.add(new_cost + bounds[x], x)
+                    elif costs[x] > new_cost:
+                        preds[x] = u
+                        costs[x] = new_cost
+                        APQ.update_key(locs[x], new_cost + bounds[x])
+        return closed
+
+    def _frozen_copy(self):
+        """ Return (frozen copy, vertex -> id), kept until the map changes. """
+        if self._frozen is None:
+            self._frozen = (self.freeze(),
+                            {v: i for i, v in enumerate(self.vertices())})
+        return self._frozen
+
+    def matrix_pool(self, processes=None):
+        """ Return a process pool to pass to distance_matrix calls.
+
+        The workers are started once, with the current frozen copy of the
+        map, so later calls skip both freezing and starting processes. The
+        pool does not see later changes to the map: make a new one after
+        them. Close it, or use it in a with statement, when done.
+
+        Args:
+            processes - the number of worker processes; defaults to the
+                number of CPUs
+        """
+        return graph_pool(self._frozen_copy()[0], processes)
+
+    def distance_matrix(self, sources, targets, processes=None, pool=None):
+        """ Return a list with one array of path costs per source, over targets.
+
+        Row i, column j is the cost from sources[i] to targets[j], or
+        infinity if there is no path. The searches run on a frozen copy of
+        the map, spread over a process pool; see
+        DistanceMatrix.distance_matrix. The copy is kept for later calls
+        until the map or its weights change.
+
+        Args:
+            sources - a list of vertex objects
+            targets - a list of vertex objects
+            processes - the number of worker processes; 1 runs in this
+                process, and the default uses every CPU
+            pool - optional pool from matrix_pool(), made since the map
+                last changed, to use instead of starting one
+        """
+        frozen, index = self._frozen_copy()
+        return distance_matrix(frozen, [index[v] for v in sources],
+                               [index[v] for v in targets], processes, pool)
+
+    def print_paths_for_GPS(self, d, sp, file=None):
+        """ Print the route sp as tab-separated lines for GPS Visualizer.
+
+        Args:
+            d - a dict of vertex -> (cost, preceding vertex), as from dijkstra
+            sp - the vertices of the route, in order
+            file - the file to write to; defaults to sys.stdout
+        """
+        write_lines(tsv_lines(route_points(self, d, sp)), file)
+
+    def export_route(self, d, sp, file=None, format='tsv'):
+        """ Write the route sp to file as 'tsv', 'gpx', 'geojson' or 'polyline'.
+
+        The route is formatted a vertex at a time and written through one
+        buffer (see RouteExport). Pass sp=d.keys() to export a whole
+        shortest-path tree.
 
-            print("W\t" + lat + "\t" + long + "\t" + el + "\t" + cost)
+        Args:
+            d - a dict of vertex -> (cost, preceding vertex), as from dijkstra
+            sp - the vertices of the route, in order
+            file - the file to write to; defaults to sys.stdout
+            format - one of the names in RouteExport.FORMATS
+        """
+        export(route_points(self, d, sp), file, format)
@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+from math import isfinite
+from urllib.parse import urlsplit, parse_qsl
+
+from MapLoader import *
+from SharedGraph import *
+from GraphPool import *
+
+
+def _ready():
+    return True
+
+
+def _route(s, t):
+    """ Return (cost, [(id, cost), ...]) for the shortest path s to t, or None. """
+    paths = worker_graph().bidirectional_dijkstra(s, t)
+    if t not in paths:
+        return None
+    path = [t]
+    while path[-1] != s:
+        path.append(paths[path[-1]][1])
+    path.reverse()
+    return paths[t][0], [(v, paths[v][0]) for v in path]
+
+
+def _matrix(sources, targets):
+    """ Return the distance rows from sources to targets, as lists. """
+    graph = worker_graph()
+    return [list(graph.one_to_many(s, targets)) for s in sources]
+
+
+class HTTPError(Exception):
+    """ An error answered with an HTTP status and a JSON message. """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable',
+           504: 'Gateway Timeout'}
+
+
+class RoutingServer:
+    """ An asyncio HTTP/JSON server answering queries on one loaded RouteMap.
+
+        Endpoints, taking GET query parameters or a POST JSON object:
+          /route?source=A&target=B - the shortest path between two labels
+          /matrix?sources=A,B&targets=C,D - the cost from each source to
+              each target, null where there is no path
+          /nearest?lat=X&long=Y&k=1 - the k vertices closest to a point
+
+        The map is frozen once, and route and matrix searches run on a pool
+        of worker processes that inherit the frozen graph when they fork.
+        With shared set, or where processes cannot be forked, the frozen
+        graph is put in a SharedGraph instead and every worker attaches to
+        that one copy.
+        Nearest-vertex lookups are answered from the spatial index on a
+        thread, so a slow one does not hold up the event loop.
+
+        Identical requests that arrive while one is being answered share its
+        result. At most max_pending searches are queued or running; beyond
+        that requests are refused with 503, and any request that takes more
+        than timeout seconds is answered with 504.
+    """
+
+    def __init__(self, routemap, host='127.0.0.1', port=8080, processes=None,
+                 max_pending=64, timeout=10.0, max_matrix=10000, max_body=1 << 20,
+                 shared=False, max_nearest=100):
+        """ Create a server for routemap; call start() or serve_forever() to run it.
+
+        Args:
+            routemap - a RouteMap object
+            host - the address to listen on
+            port - the port to listen on; 0 picks a free one
+            processes - the number of worker processes; defaults to the
+                number of CPUs
+            max_pending - the most searches queued or running at once
+            timeout - the seconds a request may take before a 504
+            max_matrix - the most cells a matrix request may ask for
+            max_body - the most bytes a POST body may have
+            shared - if True, workers attach to the graph in shared memory
+                rather than inheriting it
+            max_nearest - the largest k a nearest request may ask for
+        """
+        self.routemap = routemap
+        self.host = host
+        self.port = port
+        self.processes = processes or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.max_matrix = max_matrix
+        self.max_body = max_body
+        self.shared = shared
+        self.max_nearest = max_nearest
+        self._frozen = routemap.freeze()
+        self._ids = {v: i for i, v in enumerate(routemap.vertices())}
+        routemap.spatial_index()  # build it now, not on the first request
+        self._pool = None
+        self._shared = None  # the SharedGraph the workers attach to, if any
+        self._server = None
+        self._pending = 0  # searches queued or running
+        self._inflight = dict()  # request key -> Task being answered
+        self.coalesced = 0  # requests answered by another's search
+
+    # ---------------------------------------------------------------------#
+
+    # Running the server
+
+    async def start(self):
+        """ Start the worker pool and begin listening; returns once bound. """
+        graph = self._frozen
+        if self.shared or 'fork' not in multiprocessing.get_all_start_methods():
+            self._shared = SharedGraph(self._frozen)
+            graph = self._shared.name
+        self._pool = graph_pool(graph, self.processes, executor=True)
+        # fork the workers now, before any socket is open: a worker forked
+        # while answering a request would hold that connection open
+        await asyncio.get_running_loop().run_in_executor(self._pool, _ready)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """ Stop listening and shut the worker pool down. """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        if self._shared is not None:
+            self._shared.unlink()
+            self._shared = None
+
+    async def serve_forever(self):
+        await self.start()
+        print('Routing', self.routemap.num_vertices(), 'vertices on http://'
+              + self.host + ':' + str(self.port))
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    # ---------------------------------------------------------------------#
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        try:
+            status, body = await self._respond(reader)
+        except HTTPError as e:
+            status, body = e.status, {'error': str(e)}
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            writer.close()  # the client went away, or never sent a request
+            return
+        except Exception as e:
+            status, body = 500, {'error': repr(e)}
+        data = json.dumps(body).encode()
+        head = ('HTTP/1.1 ' + str(status) + ' ' + REASONS.get(status, '') + '\r\n'
+                + 'Content-Type: application/json\r\n'
+                + 'Content-Length: ' + str(len(data)) + '\r\n'
+                + ('Retry-After: 1\r\n' if status == 503 else '')
+                + 'Connection: close\r\n\r\n')
+        try:
+            writer.write(head.encode('latin-1') + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, reader):
+        """ Read one request and return (status, JSON-ready body). """
+        request = await asyncio.wait_for(reader.readline(), self.timeout)
+        parts = request.decode('latin-1').split()
+        if len(parts) != 3:
+            raise HTTPError(400, 'Malformed request line')
+        method, target, _ = parts
+        length = 0
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.timeout)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                try:
+                    length = int(value)
+                except ValueError:
+                    raise HTTPError(400, 'Malformed Content-Length')
+                if length < 0:
+                    raise HTTPError(400, 'Malformed Content-Length')
+                if length > self.max_body:
+                    raise HTTPError(413, 'At most ' + str(self.max_body)
+                                    + ' bytes per request body')
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        if method == 'POST':
+            if length:
+                body = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+                try:
+                    params.update(json.loads(body))
+                except (ValueError, TypeError):
+                    raise HTTPError(400, 'Body is not a JSON object')
+        elif method != 'GET':
+            raise HTTPError(405, 'Use GET or POST')
+        handler = {'/route': self.route, '/matrix': self.matrix,
+                   '/nearest': self.nearest}.get(url.path)
+        if handler is None:
+            raise HTTPError(404, 'Unknown endpoint ' + url.path)
+        return 200, await handler(params)
+
+    # ---------------------------------------------------------------------#
+
+    # Queries
+
+    def _vertex(self, label):
+        """ Return the vertex id for label, trying it as an int too. """
+        try:
+            v = self._frozen.get_vertex_by_label(label)
+        except TypeError:
+            raise HTTPError(400, 'Vertex labels must be strings or numbers')
+        if v is None and isinstance(label, str):
+            try:
+                v = self._frozen.get_vertex_by_label(int(label))
+            except ValueError:
+                pass
+        if v is None:
+            raise HTTPError(404, 'Unknown vertex ' + str(label))
+        return v
+
+    def _point(self, v):
+        lat, long = self._frozen.coordinates(v)
+        return {'id': self._frozen.element(v), 'lat': lat, 'long': long}
+
+    @staticmethod
+    def _list(value, name):
+        if value is None:
+            raise HTTPError(400, 'Missing ' + name)
+        if isinstance(value, str):
+            value = [x for x in value.split(',') if x]
+        if not isinstance(value, list):
+            raise HTTPError(400, name + ' must be a list')
+        return value
+
+    async def _search(self, key, function, *args):
+        """ Run function(*args) on the pool, sharing it with identical requests. """
+        task = self._inflight.get(key)
+        if task is None:
+            if self._pending >= self.max_pending:
+                raise HTTPError(503, 'Too many pending requests')
+            self._pending += 1
+            loop = asyncio.get_running_loop()
+            task = loop.run_in_executor(self._pool, function, *args)
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._finished(key))
+        else:
+            self.coalesced += 1
+        try:
+            # shielded, so one caller timing out does not cancel the others
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(504, 'Request timed out after '
+                            + str(self.timeout) + ' seconds')
+
+    def _finished(self, key):
+        self._pending -= 1
+        del self._inflight[key]
+
+    async def route(self, params):
+        """ Answer a /route request for params 'source' and 'target'. """
+        if 'source' not in params or 'target' not in params:
+            raise HTTPError(400, 'Missing source or target')
+        s, t = self._vertex(params['source']), self._vertex(params['target'])
+        found = await self._search(('route', s, t), _route, s, t)
+        if found is None:
+            raise HTTPError(404, 'No route from ' + str(params['source'])
+                            + ' to ' + str(params['target']))
+        cost, path = found
+        steps = []
+        for v, c in path:
+            step = self._point(v)
+            step['cost'] = c
+            steps.append(step)
+        return {'source': self._frozen.element(s), 'target': self._frozen.element(t),
+                'cost': cost, 'path': steps}
+
+    async def matrix(self, params):
+        """ Answer a /matrix request for params 'sources' and 'targets'. """
+        sources = [self._vertex(x) for x in self._list(params.get('sources'), 'sources')]
+        targets = [self._vertex(x) for x in self._list(params.get('targets'), 'targets')]
+        if len(sources) * len(targets) > self.max_matrix:
+            raise HTTPError(413, 'At most ' + str(self.max_matrix) + ' cells per matrix')
+        rows = await self._search(('matrix', tuple(sources), tuple(targets)),
+                                  _matrix, sources, targets)
+        return {'sources': [self._frozen.element(s) for s in sources],
+                'targets': [self._frozen.element(t) for t in targets],
+                'costs': [[c if c != float('inf') else None for c in row]
+                          for row in rows]}
+
+    async def nearest(self, params):
+        """ Answer a /nearest request for params 'lat', 'long' and optional 'k'. """
+        try:
+            lat, long = float(params['lat']), float(params['long'])
+            k = int(params.get('k', 1))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPError(400, 'Expected numeric lat, long and k')
+        if not (isfinite(lat) and isfinite(long)
+                and -90 <= lat <= 90 and -180 <= long <= 180):
+            raise HTTPError(400, 'lat must be in [-90, 90] and long in [-180, 180]')
+        if k < 0:
+            raise HTTPError(400, 'k must not be negative')
+        if k > self.max_nearest:
+            raise HTTPError(413, 'At most ' + str(self.max_nearest) + ' vertices per request')
+        loop = asyncio.get_running_loop()
+        lookup = loop.run_in_executor(None, self.routemap.nearest_vertices, lat, long, k)
+        try:
+            nearest = await asyncio.wait_for(lookup, self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(504, 'Request timed out after '
+                            + str(self.timeout) + ' seconds')
+        found = []
+        for v, metres in nearest:
+            point = self._point(self._ids[v])
+            point['metres'] = metres
+            found.append(point)
+        return {'lat': lat, 'long': long, 'vertices': found}
+
+
+def serve(filename, host='127.0.0.1', port=8080, processes=None, **options):
+    """ Load the map in filename and serve it until interrupted. """
+    routemap, _, _ = load_routemap(filename)
+    server = RoutingServer(routemap, host, port, processes, **options)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve routes over HTTP/JSON.')
+    parser.add_argument('map', nargs='?', default='corkCityData.txt')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--max-pending', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--max-body', type=int, default=1 << 20)
+    parser.add_argument('--max-nearest', type=int, default=100)
+    parser.add_argument('--shared-memory', action='store_true',
+                        help='have workers attach to one shared copy of the graph')
+    args = parser.parse_args()
+    serve(args.map, args.host, args.port, args.processes,
+          max_pending=args.max_pending, timeout=args.timeout, max_body=args.max_body,
+          shared=args.shared_memory, max_nearest=args.max_nearest)
@@ -0,0 +1,185 @@
+import json
+import time
+
+COUNTERS = ('settled', 'relaxations', 'inserts', 'decrease_keys', 'pops',
+            'max_queue')
+
+
+class SearchStats:
+    """ Counters and phase timings for one shortest-path search.
+
+        Pass an instance as the stats argument of Graph.dijkstra to have it
+        filled in, or set Graph.search_hook to receive one for every query.
+        Searches without stats are not instrumented at all: the counters
+        come from a CountingQueue around the priority queue and a counting
+        wrapper around the edge weight function, which are only put in
+        place when stats are wanted.
+    """
+
+    def __init__(self, hook=None):
+        """ Create empty stats.
+
+        Args:
+            hook - optional function called with these stats when the
+                search finishes
+        """
+        self.hook = hook
+        self.source = None
+        self.target = None
+        self.settled = 0  # vertices taken off the queue
+        self.relaxations = 0  # edges relaxed towards an unsettled vertex
+        self.inserts = 0
+        self.decrease_keys = 0
+        self.pops = 0
+        self.max_queue = 0  # largest number of entries in the queue
+        self.phases = dict()  # phase name -> seconds
+        self._clock = None
+        self._phase = None
+
+    def __str__(self):
+        return ' '.join(name + '=' + str(getattr(self, name)) for name in COUNTERS) \
+            + ' ' + ' '.join(phase + '=' + format(secs * 1e3, '.3f') + 'ms'
+                             for phase, secs in self.phases.items())
+
+    def phase(self, name):
+        """ End the current phase, if any, and start timing the phase name. """
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.phases[self._phase] = self.phases.get(self._phase, 0.0) + now - self._clock
+        self._phase = name
+        self._clock = now
+
+    def finish(self):
+        """ End the current phase and call the hook. """
+        self.phase(None)
+        if self.hook is not None:
+            self.hook(self)
+
+    def seconds(self):
+        """ Return the total time of all phases. """
+        return sum(self.phases.values())
+
+    def record(self):
+        """ Return a trace record of the search, as a JSON-ready dict. """
+        rec = {'source': _label(self.source), 'target': _label(self.target),
+               'seconds': self.seconds()}
+        for name in COUNTERS:
+            rec[name] = getattr(self, name)
+        rec['phases'] = dict(self.phases)
+        return rec
+
+    def weight(self, weight):
+        """ Return weight wrapped to count the edges it is called for. """
+        def counted(e):
+            self.relaxations += 1
+            return weight(e)
+        return counted
+
+
+def _label(v):
+    if v is None:
+        return None
+    element = v.element()
+    try:
+        json.dumps(element)
+        return element
+    except (TypeError, ValueError):
+        return str(element)
+
+
+class CountingQueue:
+    """ A priority queue proxy that counts the calls made to the queue it wraps. """
+
+    def __init__(self, queue, stats):
+        self._queue = queue
+        self._stats = stats
+        self._size = 0
+
+    def empty(self):
+        return self._queue.empty()
+
+    def add(self, key, item):
+        stats = self._stats
+        stats.inserts += 1
+        self._size += 1
+        if self._size > stats.max_queue:
+            stats.max_queue = self._size
+        return self._queue.add(key, item)
+
+    def get_key(self, loc):
+        return self._queue.get_key(loc)
+
+    def update_key(self, loc, newkey):
+        self._stats.decrease_keys += 1
+        self._queue.update_key(loc, newkey)
+
+    def min(self):
+        return self._queue.min()
+
+    def remove_min(self):
+        self._stats.pops += 1
+        self._size -= 1
+        return self._queue.remove_min()
+
+
+class TraceLog:
+    """ A search hook that keeps a trace record of every query.
+
+        Set graph.search_hook = TraceLog() to trace every dijkstra call,
+        optionally also writing each record as a line of JSON to a file,
+        and summarise the records later with aggregate.
+    """
+
+    def __init__(self, file=None, keep=True):
+        """ Create an empty log.
+
+        Args:
+            file - optional text file object to write JSON lines to
+            keep - if True, also keep the records in self.records
+        """
+        self.file = file
+        self.keep = keep
+        self.records = []
+
+    def __call__(self, stats):
+        rec = stats.record()
+        if self.keep:
+            self.records.append(rec)
+        if self.file is not None:
+            self.file.write(json.dumps(rec) + '\n')
+
+
+def read_trace(file):
+    """ Return the records in a file of JSON lines written by TraceLog. """
+    return [json.loads(line) for line in file if line.strip()]
+
+
+def aggregate(records, key='source', top=None):
+    """ Return per-key totals of trace records, the most expensive first.
+
+    Each entry is a dict with the key value, the number of queries, and the
+    total seconds and counters of those queries.
+
+    Args:
+        records - trace records, as made by SearchStats.record
+        key - the record field to group by, such as 'source' or 'target',
+            or a function of a record
+        top - optional number of entries to return
+    """
+    groups = dict()
+    for rec in records:
+        k = key(rec) if callable(key) else rec.get(key)
+        group = groups.get(k)
+        if group is None:
+            group = groups[k] = {'key': k, 'queries': 0, 'seconds': 0.0}
+            for name in COUNTERS:
+                group[name] = 0
+        group['queries'] += 1
+        group['seconds'] += rec['seconds']
+        for name in COUNTERS:
+            if name == 'max_queue':
+                group[name] = max(group[name], rec[name])
+            else:
+                group[name] += rec[name]
+    ranked = sorted(groups.values(), key=lambda g: g['seconds'], reverse=True)
+    return ranked if top is None else ranked[:top]
@@ -0,0 +1,84 @@
+from multiprocessing import shared_memory
+
+from GraphCache import *
+
+
+class _BufferWriter:
+    """ A minimal binary file object that writes into a buffer in place. """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._pos = 0
+
+    def write(self, data):
+        size = len(data)
+        self._buffer[self._pos:self._pos + size] = data
+        self._pos += size
+
+
+class SharedGraph:
+    """ A FrozenGraph published in a named shared memory block.
+
+        The block holds the same layout GraphCache writes to disk: a header,
+        then the label, latitude, longitude, offset, target and weight
+        arrays. Any process can attach to it by name and get a FrozenGraph
+        whose arrays are views of the block, so every process searches the
+        one copy in RAM, whatever the start method. Labels that do not fit
+        in an int64 are pickled, and are unpickled by each process that
+        attaches.
+
+        The process that creates the block owns it: call unlink(), or use
+        the SharedGraph as a context manager, to free it once the workers
+        are done.
+    """
+
+    def __init__(self, frozen, name=None):
+        """ Copy frozen into a new shared memory block.
+
+        Args:
+            frozen - a FrozenGraph object, such as RouteMap.freeze() returns
+            name - optional name for the block; a unique one is chosen if
+                omitted
+        """
+        self._shm = shared_memory.SharedMemory(name, create=True,
+                                               size=graph_size(frozen))
+        write_graph(frozen, _BufferWriter(self._shm.buf))
+        self.name = self._shm.name
+        self._graph = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
+
+    def graph(self):
+        """ Return a FrozenGraph viewing the block, for use in this process. """
+        if self._graph is None:
+            self._graph = read_graph(self._shm.buf.toreadonly(), self._shm)
+        return self._graph
+
+    def unlink(self):
+        """ Free the block. Processes still attached keep their mapping until they exit. """
+        self._graph = None
+        self._shm.unlink()
+        try:
+            self._shm.close()
+        except BufferError:  # graph() views are still in use here
+            pass
+
+
+def attach(name):
+    """ Return a read-only FrozenGraph viewing the shared graph called name.
+
+    The graph keeps the block mapped for as long as it is alive. Nothing is
+    copied, apart from labels that had to be pickled.
+
+    Args:
+        name - the name of a SharedGraph block
+    """
+    try:
+        shm = shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # before Python 3.13 attaching is always tracked
+        shm = shared_memory.SharedMemory(name)
+    return read_graph(shm.buf.toreadonly(), shm)
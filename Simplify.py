@@ -0,0 +1,182 @@
+import random
+import time
+
+from RouteMap import *
+
+
+class SimplifiedRouteMap(RouteMap):
+    """ A RouteMap whose degree-2 chains have been contracted into single edges.
+
+        Only junctions remain as vertices: vertices whose degree is not two,
+        vertices on one-way roads, and any vertices the caller asked to
+        keep. Each compound edge remembers the shape points it replaced, in
+        self.chains, so routes are drawn along the original roads:
+        print_paths_for_GPS and export_route expand every compound edge
+        back into its points, with costs interpolated along it.
+
+        Made by simplify(); see there for the details.
+    """
+
+    def __init__(self, original=None):
+        super().__init__()
+        self.original = original
+        # compound edge -> (vertex the chain starts from, [(element, lat,
+        # long), ...] of its shape points in order, [cumulative cost at each
+        # shape point, as a fraction of the edge's cost])
+        self.chains = dict()
+
+    def add_edge(self, v, w, element, length=None, oneway=False):
+        old = self.get_edge(v, w)
+        e = super().add_edge(v, w, element, length, oneway)
+        if old is not None:
+            self.chains.pop(old, None)
+        return e
+
+    def route_points(self, d, sp):
+        """ Yield (lat, long, element, cost) along sp, including shape points. """
+        for i, v in enumerate(sp):
+            lat, long = self.coords[v]
+            cost = d[v][0]
+            yield lat, long, v.element(), cost
+            if i + 1 == len(sp):
+                break
+            w = sp[i + 1]
+            chain = self.chains.get(self.get_edge(v, w))
+            if chain is None:
+                continue
+            first, points, fractions = chain
+            step = d[w][0] - cost
+            if first is v:
+                for (element, lat, long), f in zip(points, fractions):
+                    yield lat, long, element, cost + step * f
+            else:
+                for (element, lat, long), f in zip(reversed(points), reversed(fractions)):
+                    yield lat, long, element, cost + step * (1 - f)
+
+    def print_paths_for_GPS(self, d, sp, file=None):
+        write_lines(tsv_lines(self.route_points(d, sp)), file)
+
+    def export_route(self, d, sp, file=None, format='tsv'):
+        export(self.route_points(d, sp), file, format)
+
+
+def simplify(routemap, keep=()):
+    """ Return a SimplifiedRouteMap of routemap with degree-2 chains contracted.
+
+    A chain is a run of degree-2 vertices between two junctions. It becomes
+    one edge between the junctions whose cost, and length where known, is
+    the sum over the chain, so shortest paths between junctions keep their
+    costs. Chains through one-way roads are left alone, since one-way edges
+    make their vertices junctions. Where two chains, or a chain and an edge,
+    join the same two junctions, the cheaper is kept, as the map holds one
+    edge per pair. A chain that leaves a junction and returns to it is
+    dropped, along with a ring of degree-2 vertices with no junction at all.
+
+    Vertices of the result are new objects with the same elements and
+    coordinates; look them up by label. Contracted vertices cannot be
+    routed from or to, so pass any that will be queried in keep.
+
+    Args:
+        routemap - a RouteMap object
+        keep - vertices of routemap that must stay vertices
+    """
+    keep = set(keep)
+    oneway = routemap.oneway
+    simple = SimplifiedRouteMap(routemap)
+    junctions = dict()  # original vertex -> simplified vertex
+    for v in routemap.vertices():
+        edges = routemap.get_edges(v)
+        if v in keep or len(edges) != 2 or any(e in oneway for e in edges):
+            lat, long = routemap.coords[v]
+            junctions[v] = simple.add_vertex(v.element(), lat, long)
+
+    visited = set()  # original edges already part of a chain
+    for j in list(junctions):
+        for e in routemap.get_edges(j):
+            if e in visited:
+                continue
+            path, edges = [j], [e]
+            u = e.opposite(j)
+            while u not in junctions:
+                path.append(u)
+                a, b = routemap.get_edges(u)
+                e = b if a is e else a
+                edges.append(e)
+                u = e.opposite(u)
+            path.append(u)
+            visited.update(edges)
+            _add_chain(routemap, simple, junctions, path, edges)
+    return simple
+
+
+def _add_chain(routemap, simple, junctions, path, edges):
+    """ Add the chain path (original vertices, junction to junction) to simple. """
+    a, b = junctions[path[0]], junctions[path[-1]]
+    if a is b:
+        return
+    weights = [e.element() for e in edges]
+    cost = sum(weights)
+    existing = simple.get_edge(a, b)
+    if existing is not None and existing.element() <= cost:
+        return
+    lengths = [routemap.lengths.get(e) for e in edges]
+    length = None if None in lengths else sum(lengths)
+    if len(edges) == 1 and edges[0] in routemap.oneway:
+        # keep the direction of a one-way edge: it runs from start() to end()
+        if edges[0].start() is path[-1]:
+            a, b = b, a
+        simple.add_edge(a, b, cost, length, True)
+        return
+    e = simple.add_edge(a, b, cost, length)
+    if len(path) > 2:
+        points = []
+        fractions = []
+        total = 0
+        for v, w in zip(path[1:-1], weights):
+            total += w
+            lat, long = routemap.coords[v]
+            points.append((v.element(), lat, long))
+            fractions.append(total / cost if cost else 0.0)
+        simple.chains[e] = (a, points, fractions)
+
+
+def simplification_report(original, simplified, queries=20, seed=0):
+    """ Return a dict comparing the sizes of the two maps and their query times.
+
+    Times point-to-point dijkstra between the same random junction pairs in
+    both maps, and reports the largest difference in cost found, which
+    should only be rounding.
+
+    Args:
+        original - the RouteMap that was simplified
+        simplified - the SimplifiedRouteMap made from it
+        queries - the number of random queries to time
+        seed - the random seed
+    """
+    rnd = random.Random(seed)
+    junctions = list(simplified.vertices())
+    report = {'vertices': [original.num_vertices(), simplified.num_vertices()],
+              'edges': [original.num_edges(), simplified.num_edges()]}
+    for name in ('vertices', 'edges'):
+        before, after = report[name]
+        report[name + '_removed'] = 1 - after / before if before else 0.0
+    if not junctions or queries <= 0:
+        return report
+    times = [0.0, 0.0]
+    worst = 0.0
+    for _ in range(queries):
+        s, t = rnd.choice(junctions), rnd.choice(junctions)
+        os_, ot = (original.get_vertex_by_label(s.element()),
+                   original.get_vertex_by_label(t.element()))
+        start = time.perf_counter()
+        a = original.dijkstra(os_, ot)
+        middle = time.perf_counter()
+        b = simplified.dijkstra(s, t)
+        times[0] += middle - start
+        times[1] += time.perf_counter() - middle
+        if ot in a and t in b:
+            worst = max(worst, abs(a[ot][0] - b[t][0]))
+    report['query_seconds'] = [times[0] / queries, times[1] / queries]
+    report['speedup'] = times[0] / times[1] if times[1] else None
+    report['max_cost_difference'] = worst
+    return report
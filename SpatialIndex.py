@@ -0,0 +1,174 @@
+from heapq import heappush, heappushpop
+from math import radians, cos, sqrt, isfinite
+import sys
+
+from Geo import *
+
+
+class SpatialIndex:
+    """ A uniform grid of points for nearest-neighbour and box queries.
+
+        Points are projected onto a local equirectangular plane, in metres,
+        centred on the latitude of the first point, and bucketed into square
+        cells. Nearest-neighbour searches visit rings of cells around the
+        query point until no unvisited cell can hold anything closer. The
+        ranking uses the projected distance, which matches great-circle
+        order at city scale; reported distances are great-circle metres.
+
+        Keys can be any hashable objects, such as vertices or vertex ids.
+    """
+
+    def __init__(self, cell_size=200.0):
+        """ Create an empty index.
+
+        Args:
+            cell_size - the side of a grid cell, in metres
+        """
+        self.cell_size = cell_size
+        self._cells = dict()  # (cx, cy) -> list of keys
+        self._points = dict()  # key -> (lat, long, x, y)
+        self._kx = None  # metres per degree of longitude at the origin
+        self._bounds = None  # [min cx, min cy, max cx, max cy]
+
+    @classmethod
+    def from_coords(cls, coords, per_cell=2):
+        """ Return an index of coords, with cells sized for the point density.
+
+        Args:
+            coords - a dict of key -> (lat, long)
+            per_cell - the average number of points aimed for per cell
+        """
+        cell_size = 200.0
+        if len(coords) > 1:
+            lats = [lat for lat, _ in coords.values()]
+            longs = [long for _, long in coords.values()]
+            mid = (min(lats) + max(lats)) / 2
+            height = (max(lats) - min(lats)) * _KY
+            width = (max(longs) - min(longs)) * _KY * cos(radians(mid))
+            area = max(height, 1.0) * max(width, 1.0)
+            cell_size = max(sqrt(area * per_cell / len(coords)), 1.0)
+        index = cls(cell_size)
+        for key, (lat, long) in coords.items():
+            index.insert(key, lat, long)
+        return index
+
+    def __len__(self):
+        return len(self._points)
+
+    def memory_usage(self):
+        """ Return the approximate number of bytes held by the grid and points. """
+        total = sys.getsizeof(self._cells) + sys.getsizeof(self._points)
+        for cell, keys in self._cells.items():
+            total += sys.getsizeof(cell) + sys.getsizeof(keys)
+        for point in self._points.values():
+            total += sys.getsizeof(point) + sum(sys.getsizeof(x) for x in point)
+        return total
+
+    def _project(self, lat, long):
+        if not (isfinite(lat) and isfinite(long)):
+            raise ValueError('Coordinates must be finite: ' + str((lat, long)))
+        if self._kx is None:
+            self._kx = _KY * cos(radians(lat))
+        return long * self._kx, lat * _KY
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, key, lat, long):
+        """ Add key at (lat, long), replacing any earlier position of key. """
+        if key in self._points:
+            self.remove(key)
+        x, y = self._project(lat, long)
+        cell = self._cell(x, y)
+        self._points[key] = (lat, long, x, y)
+        self._cells.setdefault(cell, []).append(key)
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            b = self._bounds
+            b[0], b[1] = min(b[0], cell[0]), min(b[1], cell[1])
+            b[2], b[3] = max(b[2], cell[0]), max(b[3], cell[1])
+
+    def remove(self, key):
+        """ Remove key from the index, if present. """
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        cell = self._cell(point[2], point[3])
+        keys = self._cells[cell]
+        keys.remove(key)
+        if not keys:
+            del self._cells[cell]
+
+    def _rings(self, cx, cy):
+        """ Yield (ring number, cells) around (cx, cy), clipped to the bounds.
+
+        Rings start at the first one that reaches the bounds box, and only
+        the cells of each ring that lie inside the box are listed, so a
+        query far outside the points costs no more than one beside them.
+        """
+        x0, y0, x1, y1 = self._bounds
+        first = max(x0 - cx, cx - x1, y0 - cy, cy - y1, 0)
+        reach = max(cx - x0, cy - y0, x1 - cx, y1 - cy)
+        if first == 0:
+            yield 0, [(cx, cy)]
+            first = 1
+        for r in range(first, reach + 1):
+            ys = range(max(cy - r, y0), min(cy + r, y1) + 1)
+            xs = range(max(cx - r + 1, x0), min(cx + r - 1, x1) + 1)
+            ring = [(x, y) for x in (cx - r, cx + r) if x0 <= x <= x1 for y in ys]
+            ring += [(x, y) for y in (cy - r, cy + r) if y0 <= y <= y1 for x in xs]
+            yield r, ring
+
+    def k_nearest(self, lat, long, k):
+        """ Return up to k (key, metres) pairs nearest to (lat, long), closest first.
+
+        Raises ValueError if lat or long is not finite.
+        """
+        if not self._points or k <= 0:
+            return []
+        x, y = self._project(lat, long)
+        cx, cy = self._cell(x, y)
+        best = []  # max-heap of (-squared distance, tie, key)
+        tie = 0
+        for r, ring in self._rings(cx, cy):
+            # anything beyond this ring is at least r cells away
+            if len(best) == k and -best[0][0] <= (r - 1) ** 2 * self.cell_size ** 2:
+                break
+            for cell in ring:
+                for key in self._cells.get(cell, ()):
+                    p = self._points[key]
+                    d2 = (p[2] - x) ** 2 + (p[3] - y) ** 2
+                    tie += 1
+                    if len(best) < k:
+                        heappush(best, (-d2, tie, key))
+                    elif d2 < -best[0][0]:
+                        heappushpop(best, (-d2, tie, key))
+        best.sort(reverse=True)
+        return [(key, haversine(lat, long, *self._points[key][:2]))
+                for _, _, key in best]
+
+    def nearest(self, lat, long):
+        """ Return the (key, metres) nearest to (lat, long), or None if empty. """
+        found = self.k_nearest(lat, long, 1)
+        return found[0] if found else None
+
+    def within_box(self, min_lat, min_long, max_lat, max_long):
+        """ Return the keys whose coordinates lie inside the given box. """
+        if not self._points:
+            return []
+        x0, y0 = self._project(min_lat, min_long)
+        x1, y1 = self._project(max_lat, max_long)
+        c0, c1 = self._cell(x0, y0), self._cell(x1, y1)
+        b = self._bounds
+        found = []
+        for cx in range(max(c0[0], b[0]), min(c1[0], b[2]) + 1):
+            for cy in range(max(c0[1], b[1]), min(c1[1], b[3]) + 1):
+                for key in self._cells.get((cx, cy), ()):
+                    lat, long = self._points[key][:2]
+                    if min_lat <= lat <= max_lat and min_long <= long <= max_long:
+                        found.append(key)
+        return found
+
+
+_KY = radians(1) * EARTH_RADIUS  # metres per degree of latitude
@@ -3,6 +3,8 @@ from Element import *
 class Vertex:
     """ A Vertex in a graph. """
 
+    __slots__ = ('_element',)  # no per-instance __dict__
+
     def __init__(self, element):
         """ Create a vertex, with a data element.
 
@@ -1,62 +1,31 @@
 from AdaptablePriorityQueue import *
 from RouteMap import *
-
-
-def routereader(filename):
-    """ Read and return the route map in filename. """
-    graph = RouteMap()
-    file = open(filename, 'r')
-    entry = file.readline() #either 'Node' or 'Edge'
-    num = 0
-    while entry == 'Node\n':
-        num += 1
-        nodeid = int(file.readline().split()[1])
-        next_line = file.readline().split()
-        lat = float(next_line[1])
-        long = float(next_line[2])
-        vertex = graph.add_vertex(nodeid, lat, long)
-        entry = file.readline() #either 'Node' or 'Edge'
-    print('Read', num, 'vertices and added into the graph')
-    num = 0
-    while entry == 'Edge\n':
-        num += 1
-        source = int(file.readline().split()[1])
-        sv = graph.get_vertex_by_label(source)
-        target = int(file.readline().split()[1])
-        tv = graph.get_vertex_by_label(target)
-        length = float(file.readline().split()[1])
-        time = float(file.readline().split()[1])
-        edge = graph.add_edge(sv, tv, time)
-        file.readline() #read the one-way data
-        entry = file.readline() #either 'Node' or 'Edge'
-    print('Read', num, 'edges and added into the graph')
+from MapLoader import *
+from GraphCache import *
+
+
+def routereader(filename, frozen=False):
+    """ Read and return the route map in filename.
+
+    If frozen is True, return a read-only FrozenGraph memory-mapped from a
+    binary cache of the map instead. The cache is written next to filename
+    on the first run and rebuilt whenever the map file changes.
+    """
+    if frozen:
+        graph = load_frozen(filename)
+        print(graph)
+        return graph
+    graph, nodes, edges = load_routemap(filename, components=True)
+    print('Read', nodes, 'vertices and added into the graph')
+    print('Read', edges, 'edges and added into the graph')
     print(graph)
     return graph
 
 def graphreader(filename):
     """ Read and return the route map in filename. """
-    graph = Graph()
-    file = open(filename, 'r')
-    entry = file.readline() #either 'Node' or 'Edge'
-    num = 0
-    while entry == 'Node\n':
-        num += 1
-        nodeid = int(file.readline().split()[1])
-        vertex = graph.add_vertex(nodeid)
-        entry = file.readline() #either 'Node' or 'Edge'
-    print('Read', num, 'vertices and added into the graph')
-    num = 0
-    while entry == 'Edge\n':
-        num += 1
-        source = int(file.readline().split()[1])
-        sv = graph.get_vertex_by_label(source)
-        target = int(file.readline().split()[1])
-        tv = graph.get_vertex_by_label(target)
-        length = float(file.readline().split()[1])
-        edge = graph.add_edge(sv, tv, length)
-        file.readline() #read the one-way data
-        entry = file.readline() #either 'Node' or 'Edge'
-    print('Read', num, 'edges and added into the graph')
+    graph, nodes, edges = load_graph(filename)
+    print('Read', nodes, 'vertices and added into the graph')
+    print('Read', edges, 'edges and added into the graph')
     print(graph)
     return graph
 
@@ -119,7 +88,8 @@ def corkCityRead():
 
 
 
-corkCityRead()
+if __name__ == '__main__':
+    corkCityRead()
 
 
 # PLEASE NOTE: The method to print the shortests paths returned from the dijkstra method is print_paths(dict).